@@ -0,0 +1,179 @@
+import asyncio
+import os
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from document import render_to_bytes
+from fonts import fonts
+from utils import PageMode, stylesheets
+
+
+def warm_up():
+    """
+    Registers fonts and builds stylesheets, e.g. in a new worker process before its first document.
+    """
+    fonts.register_all()
+    for mode in PageMode:
+        stylesheets.get(mode)
+
+
+class RendererBusy(Exception):
+    """
+    Raised when the queue of requests waiting for a render slot is full.
+    A service can answer it with "503 Service Unavailable".
+    """
+    pass
+
+
+class AsyncRenderer():
+    """
+    This class renders documents for asyncio services. Builds are run on a bounded thread or process pool,
+    so the event loop is never blocked by the layout.
+    Requests wait for a free render slot in the order of their arrival.
+    """
+    def __init__(self, max_concurrency=None, max_queue=100, use_processes=False, max_tasks_per_child=None):
+        """
+        :param max_concurrency: number of documents built at the same time, the number of CPUs by default
+        :param max_queue: number of requests waiting for a render slot. New requests are rejected
+        with RendererBusy if the queue is full.
+        :param use_processes: build documents on worker processes instead of threads.
+        Threads share caches but are limited by the GIL, processes scale with cores.
+        :param max_tasks_per_child: a worker process is replaced by a new one after this number of documents,
+        so memory of workers does not grow with time. Workers are started with the spawn method then.
+        """
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.__use_processes = use_processes
+        self.__max_tasks_per_child = max_tasks_per_child
+        self.__executor = self.__new_executor()
+        # asyncio.Semaphore wakes up waiters in FIFO order
+        self.__slots = asyncio.Semaphore(self.max_concurrency)
+        self.__waiting = 0
+        self.__running = 0
+
+    def __new_executor(self) -> Executor:
+        if not self.__use_processes:
+            return ThreadPoolExecutor(self.max_concurrency, thread_name_prefix='render')
+        options = {} if self.__max_tasks_per_child is None else {'max_tasks_per_child': self.__max_tasks_per_child}
+        return ProcessPoolExecutor(self.max_concurrency, initializer=warm_up, **options)
+
+    def __replace_executor(self, broken: Executor) -> Executor:
+        """
+        Replaces a broken pool, e.g. after a worker process was killed by the OOM killer.
+        :param broken: the pool which failed
+        :return: the current pool
+        """
+        if self.__executor is broken:
+            self.__executor = self.__new_executor()
+            broken.shutdown(wait=False)
+        return self.__executor
+
+    @property
+    def queue_depth(self):
+        """
+        :return: number of requests waiting for a render slot
+        """
+        return self.__waiting
+
+    @property
+    def running(self):
+        """
+        :return: number of documents being built
+        """
+        return self.__running
+
+    async def render(self, pages: Iterable[dict], streaming=False, profile='default', theme='default') -> bytes:
+        """
+        Builds a document without blocking the event loop.
+        If the awaiting task is cancelled, a build which has not started yet is dropped.
+        A started build cannot be interrupted, it keeps its render slot until it is finished.
+        If a worker process dies, the build fails with BrokenExecutor and the next builds get a new pool.
+        :param pages: data about pages to prepare report. It must be picklable for the process pool.
+        :param streaming: build the document in the streaming mode
+        :param profile: an output profile or its name
+        :param theme: a theme or its name. Worker processes know themes from PDFGEN_THEMES,
+        other themes should be passed as Theme objects.
+        :return: content of the pdf document
+        """
+        if self.__waiting >= self.max_queue:
+            raise RendererBusy('{} requests are waiting for a render slot'.format(self.__waiting))
+        self.__waiting += 1
+        try:
+            await self.__slots.acquire()
+        finally:
+            self.__waiting -= 1
+
+        loop = asyncio.get_running_loop()
+        self.__running += 1
+        executor = self.__executor
+        try:
+            try:
+                future = executor.submit(render_to_bytes, pages, streaming, profile, theme)
+            except BrokenExecutor:
+                executor = self.__replace_executor(executor)
+                future = executor.submit(render_to_bytes, pages, streaming, profile, theme)
+        except BaseException:
+            self.__release()
+            raise
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenExecutor:
+            self.__replace_executor(executor)
+            raise
+        finally:
+            if future.done():
+                self.__release()
+            else:
+                # the task is cancelled, the slot is released only when the worker is really free
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.__release))
+
+    def __release(self):
+        self.__running -= 1
+        self.__slots.release()
+
+    def shutdown(self, wait=True):
+        """
+        Stops the pool. Builds which are already submitted are finished if wait is True.
+        """
+        self.__executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+
+
+_default_renderer: Optional[AsyncRenderer] = None
+
+
+async def generate_async(pages: Iterable[dict], streaming=False, renderer: Optional[AsyncRenderer] = None,
+                         profile='default', theme='default') -> bytes:
+    """
+    Builds a document without blocking the event loop.
+    :param pages: data about pages to prepare report
+    :param streaming: build the document in the streaming mode
+    :param renderer: a renderer with its own pool and limits. A shared thread renderer is used by default,
+    it is stopped by shutdown_default_renderer.
+    :param profile: an output profile or its name
+    :param theme: a theme or its name
+    :return: content of the pdf document
+    """
+    global _default_renderer
+    if renderer is None:
+        if _default_renderer is None:
+            _default_renderer = AsyncRenderer()
+        renderer = _default_renderer
+    return await renderer.render(pages, streaming, profile, theme)
+
+
+def shutdown_default_renderer(wait=True):
+    """
+    Stops the shared renderer of generate_async, e.g. when a service or its event loop stops.
+    The next call of generate_async creates a new one.
+    :param wait: finish builds which are already submitted
+    """
+    global _default_renderer
+    renderer, _default_renderer = _default_renderer, None
+    if renderer is not None:
+        renderer.shutdown(wait)
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, List, Union
+
+from document import DocumentGenerator
+from fonts import fonts
+from loader import iter_documents
+from profiles import PROFILES
+from themes import get_theme, themes
+
+
+class JobResult(NamedTuple):
+    """
+    The result of one report generation job.
+    """
+    output_filename: str
+    success: bool
+    # build time of the report in seconds
+    duration: float
+    error: Optional[str] = None
+
+
+class BatchJob(NamedTuple):
+    """
+    One report generation job. A job with an error is not built, it is reported as a failed job.
+    """
+    output_filename: str
+    pages: Optional[List[dict]]
+    # why the job cannot be built, e.g. its pages are missing
+    error: Optional[str] = None
+
+
+def _init_worker(font_cache_dir=None):
+    """
+    Worker process initializer. Fonts are registered only once per worker, not for each job.
+    :param font_cache_dir: directory for parsed fonts shared by workers
+    """
+    if font_cache_dir is not None:
+        fonts.cache_dir = font_cache_dir
+    fonts.register_all()
+
+
+def _new_executor(max_workers, font_cache_dir=None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(font_cache_dir,))
+
+
+def _job_result(future, output_filename) -> JobResult:
+    """
+    :return: the result of a finished job. A job which is not built because its worker process was killed
+    or its pages cannot be pickled is a failed job.
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        return JobResult(output_filename, False, 0.0, '{}: {}'.format(type(e).__name__, e))
+
+
+def render_job(output_filename, pages, profile='default', theme='default') -> JobResult:
+    """
+    Builds one report and reports a success or a failure of the build.
+    :param output_filename: this file name for a new report
+    :param pages: data about pages to prepare report
+    :param profile: name of the output profile
+    :param theme: a theme or its name
+    :return: the job result
+    """
+    start = time.perf_counter()
+    try:
+        DocumentGenerator(output_filename, pages, profile=profile, theme=theme).build()
+    except Exception as e:
+        return JobResult(output_filename, False, time.perf_counter() - start, '{}: {}'.format(type(e).__name__, e))
+    return JobResult(output_filename, True, time.perf_counter() - start)
+
+
+def read_jobs(source, format='auto') -> Iterator[BatchJob]:
+    """
+    Reads jobs lazily from a JSONL file or a JSON array. Each job is an object like
+    {"output_filename": ..., "pages": [...]} where the page mode is a name of the PageMode member.
+    Pages are validated by the worker, so a job with invalid pages fails alone.
+    A job which is not an object or has no output_filename or pages also fails alone, it has an error
+    and its output_filename is "job <number>" if it is missing.
+    :param source: a file name or a binary stream with jobs
+    :param format: 'jsonl', 'json' or 'auto', see loader.iter_documents
+    :return: iterator of jobs
+    """
+    for number, job in enumerate(iter_documents(source, format), 1):
+        label = 'job {}'.format(number)
+        if not isinstance(job, dict):
+            yield BatchJob(label, None, '{}: an object is expected, got {}'.format(label, type(job).__name__))
+            continue
+        output_filename = job.get('output_filename')
+        if not isinstance(output_filename, str) or not output_filename:
+            yield BatchJob(label, None, '{}: output_filename is missing'.format(label))
+        elif 'pages' not in job:
+            yield BatchJob(output_filename, None, '{}: pages are missing'.format(label))
+        else:
+            yield BatchJob(output_filename, job['pages'])
+
+
+def render_batch(jobs: Iterable[Union[BatchJob, Tuple[str, List[dict]]]], max_workers=None,
+                 font_cache_dir=None, profile='default', theme='default') -> Iterator[JobResult]:
+    """
+    Builds reports on a pool of worker processes.
+    Jobs are consumed lazily, only a few jobs per worker are submitted to the pool at the same time.
+    A failed job never stops the batch. If a worker process dies, jobs of the broken pool are reported
+    as failed and the next jobs are built by a new pool.
+    :param jobs: iterable of BatchJob or (output_filename, pages) jobs, jobs with an error are reported as failed
+    :param max_workers: number of worker processes, the number of CPUs by default
+    :param font_cache_dir: directory for parsed fonts shared by workers
+    :param profile: name of the output profile
+    :param theme: a theme or its name
+    :return: iterator of job results in order of their completion
+    """
+    # workers get the compiled theme, so themes registered in this process can be used
+    theme = get_theme(theme)
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_workers * 2
+    executor = _new_executor(max_workers, font_cache_dir)
+    # future: output_filename of its job
+    pending = {}
+    try:
+        for job in jobs:
+            output_filename, pages, error = BatchJob(*job)
+            if error is not None:
+                yield JobResult(output_filename, False, 0.0, error)
+                continue
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield _job_result(future, pending.pop(future))
+            try:
+                future = executor.submit(render_job, output_filename, pages, profile, theme)
+            except BrokenProcessPool:
+                # futures of the broken pool are failed jobs, the next jobs go to a new pool
+                executor.shutdown(wait=False)
+                executor = _new_executor(max_workers, font_cache_dir)
+                future = executor.submit(render_job, output_filename, pages, profile, theme)
+            pending[future] = output_filename
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield _job_result(future, pending.pop(future))
+    finally:
+        executor.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate pdf reports from a JSONL stream or a JSON array of jobs.')
+    parser.add_argument('jobs', help='a JSONL or JSON file with jobs, "-" to read jobs from stdin')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--font-cache', default=None, help='directory for parsed fonts shared by workers')
+    parser.add_argument('--profile', default='default', choices=sorted(PROFILES), help='output profile')
+    parser.add_argument('--themes', default=None, help='a JSON file with themes, see themes.py')
+    parser.add_argument('--theme', default='default', help='name of the theme')
+    args = parser.parse_args(argv)
+
+    if args.themes is not None:
+        themes.load(args.themes)
+    source = sys.stdin.buffer if args.jobs == '-' else args.jobs
+    failed = 0
+    total = 0
+    start = time.perf_counter()
+    for result in render_batch(read_jobs(source), args.workers, args.font_cache, args.profile, args.theme):
+        total += 1
+        failed += not result.success
+        print(json.dumps(result._asdict()), flush=True)
+    print('{} reports, {} failed, {:.2f}s'.format(total, failed, time.perf_counter() - start), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Benchmarks for element construction, layout and the full build of documents.
+
+Run python benchmark.py --pages 100 --output results.json to measure the current tree and
+python benchmark.py --pages 100 --baseline results.json to compare it with stored results.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import reportlab
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen.canvas import Canvas
+
+from document import DocumentGenerator, Page
+from fonts import fonts
+from metrics import measure_many
+from utils import PageMode
+
+FACE_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images', 'face.jpg')
+
+WORDS = ('facial', 'proportions', 'make', 'up', 'the', 'geometry', 'of', 'one’s', 'face', 'modern', 'anthropometry',
+         'uses', 'demographic', 'data', 'populations', 'to', 'establish', 'actual', 'that', 'contribute',
+         'attractiveness', 'for', 'group')
+
+
+class NoSaveCanvas(Canvas):
+    """
+    A canvas which lays out and draws pages, but does not write the pdf file.
+    """
+    def save(self):
+        pass
+
+
+def make_text(length, markup=True):
+    """
+    :param length: approximate length of the text in characters
+    :param markup: add inline markup like in data.data_pages, otherwise the text is plain
+    :return: a text with sentences
+    """
+    words = []
+    size = 0
+    i = 0
+    while size < length:
+        word = WORDS[i % len(WORDS)]
+        if markup and i % 17 == 0:
+            word = '<b>{}</b>'.format(word)
+        elif markup and i % 29 == 0:
+            word = "<u><font face='NeueMontrealMedium'>{}</font></u>".format(word)
+        words.append(word + ('.' if i % 12 == 11 else ''))
+        size += len(word) + 1
+        i += 1
+    return ' '.join(words) + '.'
+
+
+def make_pages(page_count=10, text_length=2000, table_rows=2, image_count=2, markup=True):
+    """
+    Generates synthetic data in the shape of data.data_pages.
+    Odd pages are regular light pages, even pages are dark statement pages with a test summary.
+    :param page_count: number of pages
+    :param text_length: length of the body text of regular pages in characters
+    :param table_rows: number of rows in the test summary
+    :param image_count: number of images in the footer of regular pages, from 0 to 2
+    :param markup: use inline markup in texts, otherwise texts are plain
+    :return: list of page dictionaries
+    """
+    if not 0 <= image_count <= 2:
+        raise ValueError('image_count should be from 0 to 2, the footer has three columns')
+    text = make_text(text_length, markup)
+    pages = []
+    for i in range(page_count):
+        page_number = i + 1
+        if i % 2 == 0:
+            page = {'page_number': page_number,
+                    'mode': PageMode.light,
+                    'header': {'class_name': 'HeaderElement',
+                               'breadcrumbs': ('Preliminary', 'Section {}'.format(i // 10), 'Theory')},
+                    'category': {'class_name': 'CategoryElement', 'name': 'Category {}'.format(i // 20)},
+                    'body': {'class_name': 'BodyElement',
+                             'title': 'Theory',
+                             'subtitle': 'What Is It?',
+                             'text': text},
+                    'footer': {'class_name': 'FooterElement',
+                               'text': 'FIG {} : Ratios greater than 1.10 are shown here.'.format(page_number),
+                               'images': (FACE_IMAGE,) * image_count}}
+        else:
+            page = {'page_number': page_number,
+                    'mode': PageMode.dark,
+                    'header': {'class_name': 'HeaderElement',
+                               'breadcrumbs': ('Preliminary', 'Section {}'.format(i // 10), 'Assessment')},
+                    'category': {'class_name': 'CategoryElement', 'name': 'Category {}'.format(i // 20)},
+                    'body': {'class_name': 'BodyStatementElement',
+                             'title': 'Assessment Overview',
+                             'subtitle': 'Next Few Pages',
+                             'text': make_text(200, markup)},
+                    'footer': {'class_name': 'FooterTestsElement',
+                               'text': 'Summary of Tests',
+                               'headers': ('Table iii', 'Raw Result', 'Explanation'),
+                               'rows': [['Analysis {}'.format(row), 'Colleagues [{}]'.format(row),
+                                         'The subject has a moderately juvenile face.'] for row in range(table_rows)]}}
+        pages.append(page)
+    return pages
+
+
+def _summary(samples):
+    return {'runs': len(samples),
+            'min': min(samples),
+            'median': statistics.median(samples),
+            'mean': statistics.fmean(samples)}
+
+
+def bench_elements(pages, repeat):
+    """
+    :return: timings of get_content for each element class and of Page.get_story
+    """
+    width = DocumentGenerator(os.devnull, []).doc.width
+    samples = defaultdict(list)
+    for _ in range(repeat):
+        objects = [Page(page, width) for page in pages]
+        totals = defaultdict(float)
+        for page in objects:
+            for element in (page.header, page.category, page.body, page.footer):
+                start = time.perf_counter()
+                element.get_content()
+                totals['element.' + type(element).__name__] += time.perf_counter() - start
+        for name, total in totals.items():
+            samples[name].append(total)
+
+        start = time.perf_counter()
+        for page in objects:
+            page.get_story()
+        samples['page.get_story'].append(time.perf_counter() - start)
+    return samples
+
+
+def bench_metrics(pages, repeat):
+    """
+    :return: timings of measurement of table cells of all pages one by one by reportlab and by measure_many
+    """
+    strings = [cell for page in pages if 'rows' in page['footer'] for row in page['footer']['rows'] for cell in row]
+    fonts.ensure('NeueMontreal')
+    samples = defaultdict(list)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in strings:
+            pdfmetrics.stringWidth(text, 'NeueMontreal', 7)
+        samples['metrics.reportlab'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        measure_many(strings, 'NeueMontreal', 7)
+        samples['metrics.measure_many'].append(time.perf_counter() - start)
+    return samples
+
+
+def bench_documents(pages, repeat):
+    """
+    :return: timings of page construction, layout without saving and the full build into a file
+    """
+    samples = defaultdict(list)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'report.pdf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            generator = DocumentGenerator(filename, pages)
+            samples['document.pages'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            generator.build(canvasmaker=NoSaveCanvas)
+            samples['document.layout'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            DocumentGenerator(filename, pages).build()
+            samples['document.build'].append(time.perf_counter() - start)
+            samples['document.bytes'].append(os.path.getsize(filename))
+    return samples
+
+
+def run(page_count=10, text_length=2000, table_rows=2, image_count=2, repeat=5):
+    """
+    Runs all benchmarks.
+    :return: a dictionary with parameters, environment and results, it can be dumped as JSON
+    """
+    params = {'pages': page_count, 'text_length': text_length, 'table_rows': table_rows,
+              'image_count': image_count, 'repeat': repeat}
+    pages = make_pages(page_count, text_length, table_rows, image_count)
+    samples = bench_elements(pages, repeat)
+    samples.update(bench_metrics(pages, repeat))
+    samples.update(bench_documents(pages, repeat))
+    return {'params': params,
+            'environment': {'python': platform.python_version(),
+                            'reportlab': reportlab.Version,
+                            'platform': platform.platform()},
+            'results': {name: _summary(values) for name, values in sorted(samples.items())}}
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    Compares median timings with a baseline.
+    :param results: results of run()
+    :param baseline: stored results of run()
+    :param threshold: the allowed relative slowdown
+    :return: list of (name, baseline median, current median, ratio, regressed) tuples
+    """
+    rows = []
+    for name, result in results['results'].items():
+        base = baseline['results'].get(name)
+        if not base or not base['median']:
+            continue
+        ratio = result['median'] / base['median']
+        rows.append((name, base['median'], result['median'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark element construction, layout and document builds.')
+    parser.add_argument('--pages', type=int, default=10, help='number of pages')
+    parser.add_argument('--text-length', type=int, default=2000, help='length of body texts in characters')
+    parser.add_argument('--table-rows', type=int, default=2, help='number of rows in test summaries')
+    parser.add_argument('--images', type=int, default=2, help='number of images in footers, from 0 to 2')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of each benchmark')
+    parser.add_argument('--output', default=None, help='file for JSON results, stdout by default')
+    parser.add_argument('--baseline', default=None, help='JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed relative slowdown')
+    args = parser.parse_args(argv)
+
+    results = run(args.pages, args.text_length, args.table_rows, args.images, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['params'] != results['params']:
+            print('warning: parameters differ from the baseline {}'.format(baseline['params']), file=sys.stderr)
+        regressions = 0
+        for name, base, current, ratio, regressed in compare(results, baseline, args.threshold):
+            regressions += regressed
+            print('{:<40} {:>12.6g} {:>12.6g} {:>7.2f}x{}'.format(name, base, current, ratio,
+                                                                  '  REGRESSION' if regressed else ''),
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
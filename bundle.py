@@ -0,0 +1,245 @@
+import argparse
+import os
+import sys
+import time
+import zipfile
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+from reportlab.platypus import Flowable
+
+from document import DocumentGenerator
+from fragments import PageFragmentCache
+from loader import iter_documents
+from model import PageDataError, load_pages
+from profiles import PROFILES, get_profile
+from themes import themes
+
+
+class BundleDocument(NamedTuple):
+    """
+    One report of a bundle, e.g. the report of one customer.
+    """
+    # title of the outline entry or name of the file in an archive
+    title: str
+    # data about pages to prepare report
+    pages: Iterable[dict]
+
+
+class OutlineEntry(Flowable):
+    """
+    An invisible flowable which marks the page where it is drawn and adds an entry to the outline of the pdf.
+    """
+    def __init__(self, title, key, level=0):
+        """
+        :param title: text of the outline entry
+        :param key: unique name of the bookmark
+        :param level: nesting level of the entry
+        """
+        super().__init__()
+        self.title = title
+        self.key = key
+        self.level = level
+        self.width = self.height = 0
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        # the outline is shown when the document is opened
+        self.canv.showOutline()
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, self.level)
+
+
+class _BookmarkedPage():
+    """
+    The first page of a report in a bundle, its story starts with the outline entry of the report.
+    """
+    __slots__ = ('page', 'entry', 'mode', 'page_number')
+
+    def __init__(self, page, entry: OutlineEntry):
+        self.page = page
+        self.entry = entry
+        self.mode = page.mode
+        self.page_number = page.page_number
+
+    def get_story(self):
+        return [self.entry] + self.page.get_story()
+
+
+class BundleGenerator():
+    """
+    This class builds many reports into one pdf document, e.g. for printing.
+    Reports are laid out one by one in the streaming mode, so memory does not grow with the number of reports.
+    Fonts, backgrounds and images are embedded once for the whole bundle,
+    and each report has an entry in the outline of the document.
+    """
+    def __init__(self, output_filename, documents: Iterable[BundleDocument], profile='default',
+                 page_cache: Optional[PageFragmentCache] = None, theme='default'):
+        """
+        :param output_filename: this file name for the bundle or a writable binary file-like object
+        :param documents: reports of the bundle, it can be a generator
+        :param profile: an output profile or its name
+        :param page_cache: cache of laid out pages, reusable pages are laid out once for all reports
+        :param theme: a theme or its name
+        """
+        self.generator = DocumentGenerator(output_filename, (), streaming=True, page_cache=page_cache,
+                                           profile=profile, theme=theme)
+        self.generator.pages = self.__iter_pages(documents)
+        self.count = 0
+
+    def __iter_pages(self, documents: Iterable[BundleDocument]):
+        """
+        :return: pages of all reports, the first page of each report carries its outline entry
+        """
+        for title, pages in documents:
+            # a report is validated before its first page is laid out, so an invalid report stops the build early
+            try:
+                pages = load_pages(pages)
+            except PageDataError as e:
+                raise PageDataError('{}: {}'.format(title, e)) from None
+            self.count += 1
+            entry = OutlineEntry(title, 'document{}'.format(self.count))
+            for page in pages:
+                page = self.generator.create_page(page)
+                if entry is not None:
+                    page = _BookmarkedPage(page, entry)
+                    entry = None
+                yield page
+
+    def build(self):
+        """
+        build the bundle and save it
+        """
+        self.generator.build()
+
+
+def _archive_name(title, names: set) -> str:
+    """
+    :param title: title of a report
+    :param names: names of files which are already in the archive
+    :return: a unique file name of the report in the archive
+    """
+    base = os.path.basename(title) or 'report'
+    if base.lower().endswith('.pdf'):
+        base = base[:-4]
+    name = base + '.pdf'
+    number = 1
+    while name in names:
+        number += 1
+        name = '{}-{}.pdf'.format(base, number)
+    names.add(name)
+    return name
+
+
+def write_archive(output_filename, documents: Iterable[BundleDocument], profile='default',
+                  page_cache: Optional[PageFragmentCache] = None, compression=zipfile.ZIP_STORED,
+                  theme='default') -> List[str]:
+    """
+    Builds every report directly into its entry of a ZIP archive. The archive is written sequentially,
+    so output_filename can be a non-seekable stream, e.g. stdout or a response.
+    Each pdf of the archive is a complete document with its own fonts and images,
+    but fonts are parsed and images are decoded once for all reports.
+    :param output_filename: this file name for the archive or a writable binary file-like object
+    :param documents: reports of the archive, it can be a generator
+    :param profile: an output profile or its name
+    :param page_cache: cache of laid out pages, reusable pages are laid out once for all reports
+    :param compression: compression of archive entries, pdf documents are already compressed by default
+    :param theme: a theme or its name
+    :return: names of files in the archive
+    """
+    profile = get_profile(profile)
+    names = set()
+    order = []
+    with zipfile.ZipFile(output_filename, 'w', compression=compression) as archive:
+        for title, pages in documents:
+            name = _archive_name(title, names)
+            order.append(name)
+            with archive.open(name, 'w', force_zip64=True) as entry:
+                DocumentGenerator(entry, pages, page_cache=page_cache, profile=profile, theme=theme).build()
+    return order
+
+
+def write_bundle(output_filename, documents: Iterable[BundleDocument], profile='default',
+                 page_cache: Optional[PageFragmentCache] = None, theme='default') -> int:
+    """
+    Builds reports into one pdf document with an outline entry for each report.
+    :param output_filename: this file name for the bundle or a writable binary file-like object
+    :param documents: reports of the bundle, it can be a generator
+    :param profile: an output profile or its name
+    :param page_cache: cache of laid out pages, reusable pages are laid out once for all reports
+    :param theme: a theme or its name
+    :return: number of reports in the bundle
+    """
+    bundle = BundleGenerator(output_filename, documents, profile, page_cache, theme)
+    bundle.build()
+    return bundle.count
+
+
+def _report_error(message):
+    print('skipped: {}'.format(message), file=sys.stderr)
+
+
+def read_documents(source, format='auto', on_error: Optional[Callable[[str], None]] = None) \
+        -> Iterator[BundleDocument]:
+    """
+    Reads reports lazily, in the format of the batch jobs: {"title": ..., "pages": [...]}, or as bare lists of pages.
+    The file name of output_filename of a job is used as its title if the title is missing.
+    Reports without a list of pages are skipped before anything of them is written to the bundle.
+    :param source: a file name or a binary stream
+    :param format: 'jsonl', 'json' or 'auto', see loader.iter_documents
+    :param on_error: a function called with a message for each skipped report, the message is printed
+    to stderr if it is None
+    :return: iterator of reports
+    """
+    on_error = on_error or _report_error
+    for number, document in enumerate(iter_documents(source, format), 1):
+        default_title = 'Report {}'.format(number)
+        if isinstance(document, list):
+            yield BundleDocument(default_title, document)
+            continue
+        if not isinstance(document, dict):
+            on_error('{}: an object or a list of pages is expected, got {}'.format(default_title,
+                                                                                  type(document).__name__))
+            continue
+        title = document.get('title')
+        output_filename = document.get('output_filename')
+        if not title and isinstance(output_filename, str) and output_filename:
+            title = os.path.splitext(os.path.basename(output_filename))[0]
+        title = str(title) if title else default_title
+        pages = document.get('pages')
+        if not isinstance(pages, list):
+            on_error('{}: pages should be a list, got {}'.format(title, type(pages).__name__))
+            continue
+        yield BundleDocument(title, pages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build many reports into one pdf document or a ZIP archive.')
+    parser.add_argument('documents', help='a JSONL or JSON file with reports, "-" to read reports from stdin')
+    parser.add_argument('-o', '--output', required=True, help='the bundle file, "-" to write a ZIP archive to stdout')
+    parser.add_argument('--format', default=None, choices=('pdf', 'zip'),
+                        help='format of the bundle, it is chosen by the extension of the output by default')
+    parser.add_argument('--profile', default='default', choices=sorted(PROFILES), help='output profile')
+    parser.add_argument('--themes', default=None, help='a JSON file with themes, see themes.py')
+    parser.add_argument('--theme', default='default', help='name of the theme')
+    args = parser.parse_args(argv)
+
+    if args.themes is not None:
+        themes.load(args.themes)
+    source = sys.stdin.buffer if args.documents == '-' else args.documents
+    output = sys.stdout.buffer if args.output == '-' else args.output
+    format = args.format or ('pdf' if args.output.lower().endswith('.pdf') else 'zip')
+    # pages which are the same in all reports are laid out once
+    page_cache = PageFragmentCache()
+    start = time.perf_counter()
+    if format == 'pdf':
+        count = write_bundle(output, read_documents(source), args.profile, page_cache, args.theme)
+    else:
+        count = len(write_archive(output, read_documents(source), args.profile, page_cache, theme=args.theme))
+    print('{} reports, {:.2f}s'.format(count, time.perf_counter() - start), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+from copy import copy
+from math import ceil
+
+from reportlab.platypus import Flowable, Paragraph
+from reportlab.platypus.paragraph import FragLine, ParaLines
+
+
+class ParagraphLines():
+    """
+    A paragraph broken into lines once for the column width. Any range of lines can be taken
+    as a new paragraph, so the text is never broken again and its markup is kept.
+    """
+    def __init__(self, paragraph: Paragraph, width):
+        """
+        :param paragraph: a paragraph with the text
+        :param width: width of a column
+        """
+        self.paragraph = paragraph
+        self.width = width
+        paragraph.wrap(width, 0x7fffffff)
+        self.lines = paragraph.blPara.lines if paragraph.frags else []
+        self.leading = paragraph.style.leading
+        # styles of lines after the first one, the first line indent is only used at the start of the text
+        self.__rest_style = copy(paragraph.style)
+        self.__rest_style.firstLineIndent = 0
+
+    def __len__(self):
+        return len(self.lines)
+
+    def get_paragraph(self, start, stop) -> Paragraph:
+        """
+        :param start: index of the first line
+        :param stop: index after the last line
+        :return: a paragraph with lines from start to stop
+        """
+        if start == 0 and stop == len(self.lines):
+            return self.paragraph
+        blPara = self.paragraph.blPara
+        frags = self.paragraph._get_split_blParaFunc()(blPara, start, stop)
+        style = self.paragraph.style if start == 0 else self.__rest_style
+        paragraph = Paragraph(None, style, frags=frags)
+        if blPara.kind == 0:
+            # lines of a text without markup are (width, words) tuples, the font, color and decorations
+            # are kept by the paragraph lines, see Paragraph.breakLines
+            paragraph.blPara = blPara.clone(lines=self.lines[start:stop], aH=0x7fffffff, aW=self.width)
+        else:
+            paragraph.blPara = ParaLines(kind=1, lines=self.lines[start:stop], aH=0x7fffffff, aW=self.width)
+        if stop < len(self.lines):
+            # the last line of a part is justified as the line inside of the text, see Paragraph.split
+            line = self.lines[stop - 1]
+            paragraph._JustifyLast = not (isinstance(line, FragLine) and getattr(line, 'lineBreak', False))
+        paragraph._splitpara = 1
+        paragraph.width = self.width
+        paragraph.height = (stop - start) * self.leading
+        return paragraph
+
+
+class ColumnFlow(Flowable):
+    """
+    A text in balanced columns on the right of a side flowable, e.g. a title, with a heading above the columns.
+    The text is broken into lines once and columns get equal numbers of lines, so the layout takes
+    linear time for any length of the text. The text which does not fit is continued on the next page
+    without the side flowable and the heading.
+    """
+    def __init__(self, text: Paragraph, side=None, heading=None, side_width=0, heading_height=0, column_count=2,
+                 column_gap=12, right_padding=0, lines: ParagraphLines = None, start=0, stop=None,
+                 lines_per_column=None):
+        """
+        :param text: a paragraph with the text
+        :param side: a flowable on the left of the columns
+        :param heading: a flowable above the columns
+        :param side_width: width of the side column, the column gap is kept on the right of the side flowable
+        :param heading_height: height of the space for the heading
+        :param column_count: number of text columns
+        :param column_gap: space between text columns
+        :param right_padding: space on the right of the last column
+        :param lines: the text broken into lines, it is shared by parts of the split flow
+        :param start: index of the first line of the text in this part
+        :param stop: index after the last line of the text in this part
+        :param lines_per_column: number of lines in a column, the columns are balanced if it is None
+        """
+        super().__init__()
+        self.text = text
+        self.side = side
+        self.heading = heading
+        self.side_width = side_width
+        self.heading_height = heading_height if heading is not None else 0
+        self.column_count = column_count
+        self.column_gap = column_gap
+        self.right_padding = right_padding
+        self.lines = lines
+        self.start = start
+        self.stop = stop
+        self.lines_per_column = lines_per_column
+        self.side_height = 0
+        self.heading_drawn_height = 0
+
+    def __column_width(self, availWidth):
+        columns_width = availWidth - self.side_width - self.right_padding
+        return (columns_width - self.column_gap * (self.column_count - 1)) / self.column_count
+
+    def __get_lines(self, availWidth) -> ParagraphLines:
+        width = self.__column_width(availWidth)
+        if self.lines is None or self.lines.width != width:
+            self.lines = ParagraphLines(self.text, width)
+            self.stop = None
+        if self.stop is None:
+            self.stop = len(self.lines)
+        return self.lines
+
+    def __text_height(self, lines_per_column):
+        return lines_per_column * self.lines.leading
+
+    def wrap(self, availWidth, availHeight):
+        self.__get_lines(availWidth)
+        if self.lines_per_column is None:
+            self.lines_per_column = ceil((self.stop - self.start) / self.column_count)
+        if self.side is not None:
+            _, self.side_height = self.side.wrap(self.side_width - self.column_gap, availHeight)
+        if self.heading is not None:
+            _, self.heading_drawn_height = self.heading.wrap(availWidth - self.side_width, self.heading_height)
+        self.width = availWidth
+        self.height = max(self.side_height, self.heading_height + self.__text_height(self.lines_per_column))
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        lines = self.__get_lines(availWidth)
+        if self.side is not None:
+            _, self.side_height = self.side.wrap(self.side_width - self.column_gap, availHeight)
+            if self.side_height > availHeight:
+                return []
+        lines_per_column = int((availHeight - self.heading_height) / lines.leading)
+        count = self.stop - self.start
+        if lines_per_column * self.column_count >= count:
+            return [self]
+        # a part with one line per column would only leave orphans, the flow is moved to the next page
+        if lines_per_column < 2:
+            return []
+        middle = self.start + lines_per_column * self.column_count
+        return [
+            ColumnFlow(self.text, self.side, self.heading, self.side_width, self.heading_height,
+                       self.column_count, self.column_gap, self.right_padding, lines, self.start, middle,
+                       lines_per_column),
+            ColumnFlow(self.text, None, None, self.side_width, 0, self.column_count, self.column_gap,
+                       self.right_padding, lines, middle, self.stop),
+        ]
+
+    def draw(self):
+        canv = self.canv
+        if self.side is not None:
+            self.side.drawOn(canv, 0, self.height - self.side_height)
+        if self.heading is not None:
+            self.heading.drawOn(canv, self.side_width, self.height - self.heading_drawn_height)
+        top = self.height - self.heading_height
+        width = self.lines.width
+        for column in range(self.column_count):
+            start = self.start + column * self.lines_per_column
+            stop = min(start + self.lines_per_column, self.stop)
+            if start >= stop:
+                break
+            paragraph = self.lines.get_paragraph(start, stop)
+            x = self.side_width + column * (width + self.column_gap)
+            paragraph.drawOn(canv, x, top - self.__text_height(stop - start))
@@ -1,95 +1,361 @@
+import os
+from io import BytesIO
+
 from utils import PageMode
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Spacer, TopPadder, PageBreak
-from typing import List
-from elements import HeaderElement, CategoryElement, SubtitleElement, BodyElement, \
-    BodyStatementElement, FooterElement, FooterTestsElement
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.graphics.shapes import Drawing, Rect
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Spacer, TopPadder
+from reportlab.platypus.flowables import PageBreakIfNotEmpty
+from typing import Iterable, Iterator, Optional, Union
+from fragments import PageFragment, PageFragmentCache, page_key
+from instrumentation import BuildStats, TimedFlowable, current_stats, span_of
+from layout_cache import drawing_cache, SharedDrawing
+from model import PageData
+from profiles import OutputProfile, get_profile, use_profile
+from themes import Theme, get_theme, theme_digest, use_theme
 
 
 class Page():
     """
     This class keeps data about the page, creates all page structure and nested content elements.
     """
+    __slots__ = ('mode', 'page_number', 'header', 'category', 'body', 'footer')
+
     def __init__(self, data, width):
         """
-        :param data: dictionary with data about page
+        :param data: validated PageData or a dictionary with data about page, which is validated here
         :param width: width of the page. The page use width for drawing elements.
         """
+        data = PageData.from_dict(data)
         # Mode of the page (dark or light)
-        self.mode = data['mode']
-        self.page_number = data['page_number']
+        self.mode = data.mode
+        self.page_number = data.page_number
 
-        # Dynamic classes assignment using data about the page.
+        # Element classes are resolved using data about the page when the data is validated.
         # Each content element can have different classes for the particular design layout realisation.
-        self.header = globals()[data['header']['class_name']](data['header'], width, self.page_number, self.mode)
-        self.category = globals()[data['category']['class_name']](data['category'], self.mode)
-        self.body = globals()[data['body']['class_name']](data['body'], width, self.page_number, self.mode)
-        self.footer = globals()[data['footer']['class_name']](data['footer'], width, self.mode)
+        self.header = data.header.element_class(data.header.attributes, width, self.page_number, self.mode)
+        self.category = data.category.element_class(data.category.attributes, self.mode)
+        self.body = data.body.element_class(data.body.attributes, width, self.page_number, self.mode)
+        self.footer = data.footer.element_class(data.footer.attributes, width, self.mode)
 
     def get_story(self):
         """
         The page generates own story for all content elements.
         :return:
         """
+        stats = current_stats()
+        if stats is not None:
+            return self.__get_timed_story(stats)
+        return self.__compose_story(self.header.get_content(), self.category.get_content(),
+                                    self.body.get_content(), self.footer.get_content())
+
+    def __get_timed_story(self, stats: BuildStats):
+        """
+        The same story, but creation, layout and drawing of each content element are measured.
+        """
+        with stats.span('page.story'):
+            contents = []
+            for element in (self.header, self.category, self.body, self.footer):
+                name = type(element).__name__
+                with stats.span('element.' + name):
+                    content = element.get_content()
+                contents.append(TimedFlowable(content, 'layout.' + name, stats))
+                stats.count('images', len(getattr(element, 'images', ())))
+            story = self.__compose_story(*contents)
+        stats.count('flowables', len(story))
+        return story
+
+    @staticmethod
+    def __compose_story(header, category, body, footer):
+        """
+        :return: the page layout of the content elements
+        """
         return [
-            self.header.get_content(),
+            header,
             Spacer(0, 50),
-            self.category.get_content(),
+            category,
             Spacer(0, 4),
-            self.body.get_content(),
-            TopPadder(self.footer.get_content()),
+            body,
+            TopPadder(footer),
         ]
 
 
+class ReusablePage():
+    """
+    A page without customer-specific data, which is marked as reusable in the page data.
+    Its content is laid out once and reused by all documents, see fragments.py.
+    """
+    def __init__(self, data: PageData, width, cache: PageFragmentCache, profile: OutputProfile, theme: Theme):
+        """
+        :param data: validated data about page
+        :param width: width of the page
+        :param cache: cache of laid out pages
+        :param profile: output profile of the document, pages are laid out with its images
+        :param theme: theme of the document
+        """
+        self.data = data
+        self.width = width
+        self.cache = cache
+        self.mode = data.mode
+        self.page_number = data.page_number
+        self.key = page_key(data, width, profile.name, theme_digest(theme))
+
+    def get_story(self):
+        """
+        :return: a story with the whole page content as one flowable
+        """
+        return [PageFragment(self.key, self.__get_page_story, self.cache)]
+
+    def __get_page_story(self):
+        # page elements are created only if the page is not cached yet
+        return Page(self.data, self.width).get_story()
+
+
+class ModePageTemplate(PageTemplate):
+    """
+    A page template for pages of one mode. The page data chooses the template of each page.
+    The background is a cached drawing, it is drawn once per document into a form XObject
+    and every page of the mode only refers to the form.
+    """
+    def __init__(self, mode: PageMode, frame: Frame, pagesize, theme: Theme):
+        """
+        :param mode: page mode, its name is the id of the template
+        :param frame: the frame for the page content
+        :param pagesize: size of the page
+        :param theme: theme of the document, it defines the background color of the mode
+        """
+        super().__init__(id=mode.name, frames=[frame], pagesize=pagesize)
+        self.mode = mode
+        self.theme = theme
+
+    def beforeDrawPage(self, canv, doc):
+        name = 'background_' + self.mode.name
+        if not canv.hasForm(name):
+            width, height = self.pagesize
+            drawing = drawing_cache.get(('background', self.mode, self.theme, width, height), self.__get_background)
+            canv.beginForm(name)
+            SharedDrawing(drawing).drawOn(canv, 0, 0)
+            canv.endForm()
+        canv.doForm(name)
+
+    def __get_background(self) -> Drawing:
+        """
+        :return: a drawing which fills the page with the background color of the mode
+        """
+        width, height = self.pagesize
+        d = Drawing(width, height)
+        d.add(Rect(0, 0, width, height, fillColor=self.theme.colors(self.mode).background, strokeColor=None))
+        return d
+
+
+class StoryStream(list):
+    """
+    A story which is filled lazily from an iterator of flowable chunks.
+    The document template takes flowables from the head of the story, so the next chunk is requested only
+    when all flowables of the previous one are laid out, and laid out flowables are released.
+    """
+    def __init__(self, chunks: Iterator[list]):
+        """
+        :param chunks: iterator of flowable lists, e.g. stories of pages
+        """
+        super().__init__()
+        self.__chunks = chunks
+
+    def __len__(self):
+        while not list.__len__(self):
+            chunk = next(self.__chunks, None)
+            if chunk is None:
+                return 0
+            self.extend(chunk)
+        return list.__len__(self)
+
+    def __bool__(self):
+        return len(self) > 0
+
+
 class DocumentGenerator():
     """
     This is a class generator of pdf documents.
     This class collects information about pages, generates stories for pages, and builds and saves pdf.
     """
 
-    def __init__(self, output_filename, pages):
+    def __init__(self, output_filename, pages: Iterable[dict], streaming=False, stats: Optional[BuildStats] = None,
+                 page_cache: Optional[PageFragmentCache] = None, profile: Union[str, OutputProfile] = 'default',
+                 theme: Union[str, Theme] = 'default'):
         """
-        :param output_filename: this file name for a new report
-        :param pages: data about pages to prepare report
+        :param output_filename: this file name for a new report or a writable binary file-like object
+        :param pages: data about pages to prepare report, validated PageData or dictionaries
+        :param streaming: if it is True, pages can be a generator. Pages and their stories are created lazily
+        during the build and released after the layout, so memory does not grow with the number of pages.
+        A streaming document can be built only once.
+        :param stats: stats for timings and counters of the build, instrumentation is disabled if it is None
+        :param page_cache: cache of laid out pages. Pages marked with 'reusable': True are laid out once
+        and reused by all documents with the same cache. All pages are laid out if it is None.
+        :param profile: an output profile or its name from profiles.PROFILES: 'fast', 'default' or 'small'
+        :param theme: a theme or a name of a registered theme, see themes.py
         """
-        self.doc = SimpleDocTemplate(output_filename, pagesize=letter,
-                                     showBoundary=0,
-                                     leftMargin=inch * 0.2708333333,
-                                     rightMargin=inch * 0.2708333333,
-                                     topMargin=inch * 0.1666666667,
-                                     bottomMargin=inch * 0.5
-                                     )
-        self.pages: List[Page] = [Page(page, self.doc.width) for page in pages]
-        self.currentMode = PageMode.light
+        self.profile = get_profile(profile)
+        self.theme = get_theme(theme)
+        self.doc = BaseDocTemplate(output_filename, pagesize=letter,
+                                   pageCompression=int(self.profile.page_compression),
+                                   showBoundary=0,
+                                   leftMargin=inch * 0.2708333333,
+                                   rightMargin=inch * 0.2708333333,
+                                   topMargin=inch * 0.1666666667,
+                                   bottomMargin=inch * 0.5
+                                   )
+        # each mode has own page template with its background
+        self.doc.addPageTemplates([ModePageTemplate(mode, Frame(self.doc.leftMargin, self.doc.bottomMargin,
+                                                                self.doc.width, self.doc.height, id='normal'),
+                                                    self.doc.pagesize, self.theme)
+                                   for mode in PageMode])
+        self.streaming = streaming
+        self.stats = stats
+        self.page_cache = page_cache
+        # content elements take the current theme when they are created, streaming pages are created in build
+        with use_theme(self.theme):
+            if streaming:
+                self.pages: Iterable[Page] = (self.create_page(page) for page in pages)
+            elif stats is not None:
+                with stats.activate():
+                    self.pages: Iterable[Page] = [self.create_page(page) for page in pages]
+            elif page_cache is not None:
+                self.pages: Iterable[Page] = [self.create_page(page) for page in pages]
+            else:
+                self.pages: Iterable[Page] = [Page(page, self.doc.width) for page in pages]
+
+    def create_page(self, data):
+        """
+        :param data: validated PageData or a dictionary with data about page
+        :return: a new page of the document
+        """
+        if self.page_cache is not None:
+            data = PageData.from_dict(data)
+            if data.reusable:
+                return ReusablePage(data, self.doc.width, self.page_cache, self.profile, self.theme)
+        with span_of(current_stats(), 'page.init'):
+            return Page(data, self.doc.width)
+
+    def __iter_page_stories(self) -> Iterator[list]:
+        """
+        :return: iterator of stories of the pages
+        """
+        for page in self.pages:
+            story = page.get_story()
+            # the page starts on a new sheet with the template of its mode, the first page only chooses the template.
+            # Sheets with the continuation of a long page keep the template.
+            story.insert(0, PageBreakIfNotEmpty(nextTemplate=page.mode.name))
+            yield story
 
     def __get_story(self):
         """
         :return: story content elements for all pages of the document
         """
-        story = []
-        for i, page in enumerate(self.pages):
-            if i > 0:
-                story.append(PageBreak())
-            story.extend(page.get_story())
-        return story
+        if self.streaming:
+            return StoryStream(self.__iter_page_stories())
+        return [flowable for story in self.__iter_page_stories() for flowable in story]
 
-    def __onSetPageColor(self, canvas, document):
+    def build(self, canvasmaker=Canvas):
         """
-        This is a call-back function for starting a new page of the document.
+        build document and save document
+        :param canvasmaker: a canvas class for the document, e.g. to measure layout without saving of the pdf
         """
-        # Change background color for the page
-        if (self.currentMode == PageMode.light):
-            self.currentMode = PageMode.dark
-        else:
-            self.currentMode = PageMode.light
-        canvas.setFillColor(self.currentMode.value)
-        canvas.rect(0, 0, document.width + document.leftMargin + document.rightMargin, document.height
-                    + document.topMargin + document.bottomMargin,
-                    fill=True, stroke=False)
+        if self.stats is None:
+            with use_profile(self.profile), use_theme(self.theme):
+                self.doc.build(self.__get_story(), canvasmaker=canvasmaker)
+            return
+        output = self.doc.filename
+        # file-like outputs are counted while writing, they can be pipes or zip entries without tell
+        writer = _CountingWriter(output) if hasattr(output, 'write') else None
+        if writer is not None:
+            self.doc.filename = writer
+        try:
+            with self.stats.activate(), use_profile(self.profile), use_theme(self.theme), \
+                    self.stats.span('document.build'):
+                self.doc.build(self.__get_story(), canvasmaker=_timed_canvas(canvasmaker, self.stats))
+        finally:
+            self.doc.filename = output
+        self.stats.count('pages', self.doc.page)
+        # size of the document for comparison of profiles
+        size = writer.size if writer is not None else os.path.getsize(output)
+        self.stats.count('bytes.' + self.profile.name, size)
+
 
-    def build(self):
+class _CountingWriter():
+    """
+    A writable file-like object which counts bytes written to the output of a document.
+    """
+    def __init__(self, output):
         """
-        build document and save document
+        :param output: a writable binary file-like object
         """
-        self.doc.build(self.__get_story(), onLaterPages=self.__onSetPageColor)
+        self.output = output
+        self.size = 0
+        # reportlab uses the name of the file in its messages
+        name = getattr(output, 'name', None)
+        if name is not None:
+            self.name = name
+
+    def write(self, data):
+        self.size += len(data)
+        return self.output.write(data)
+
+
+def _timed_canvas(canvasmaker, stats: BuildStats):
+    """
+    :return: a canvas class which measures writing of the pdf
+    """
+    class TimedCanvas(canvasmaker):
+        def save(self):
+            with stats.span('document.save'):
+                super().save()
+    return TimedCanvas
+
+
+def render_to_buffer(pages: Iterable[dict], buffer, streaming=False, profile='default', theme='default'):
+    """
+    Builds a document into a caller-supplied buffer, nothing is written to disk.
+    :param pages: data about pages to prepare report
+    :param buffer: a writable binary file-like object, e.g. BytesIO or a response stream
+    :param streaming: build the document in the streaming mode
+    :param profile: an output profile or its name
+    :param theme: a theme or its name
+    """
+    DocumentGenerator(buffer, pages, streaming=streaming, profile=profile, theme=theme).build()
+
+
+def render_to_bytes(pages: Iterable[dict], streaming=False, profile='default', theme='default') -> bytes:
+    """
+    :param pages: data about pages to prepare report
+    :param streaming: build the document in the streaming mode
+    :param profile: an output profile or its name
+    :param theme: a theme or its name
+    :return: content of the pdf document
+    """
+    buffer = BytesIO()
+    render_to_buffer(pages, buffer, streaming, profile, theme)
+    return buffer.getvalue()
+
+
+def iter_pdf_chunks(pages: Iterable[dict], chunk_size=64 * 1024, streaming=False, profile='default',
+                    theme='default') -> Iterator[memoryview]:
+    """
+    Builds a document in memory and yields it by chunks, e.g. for a chunked HTTP response.
+    The document is built completely before the first chunk, chunks are views of the buffer without copying.
+    :param pages: data about pages to prepare report
+    :param chunk_size: size of chunks in bytes
+    :param streaming: build the document in the streaming mode
+    :param profile: an output profile or its name
+    :param theme: a theme or its name
+    :return: iterator of chunks of the pdf document
+    """
+    buffer = BytesIO()
+    render_to_buffer(pages, buffer, streaming, profile, theme)
+    view = buffer.getbuffer()
+    try:
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+    finally:
+        view.release()
@@ -1,15 +1,91 @@
 from abc import ABC, abstractmethod
-from utils import split_text, getStyleSheet, PageMode, get_page_number_as_str
+from importlib.metadata import entry_points
+from typing import Dict, List
+
+from columns import ColumnFlow
+from fonts import fonts
+from images import image_cache
+from layout_cache import drawing_cache, SharedDrawing
+from metrics import measure_many, string_width
+from plans import element_plans
+from profiles import current_profile
+from tables import StreamingTable, make_cells
+from themes import current_theme
+from utils import PageMode, get_page_number_as_str
 from reportlab.graphics.shapes import Drawing, String, Line, Circle, Rect
-from reportlab.platypus import Paragraph, Image
-from reportlab.lib import colors
+from reportlab.platypus import Paragraph
 from reportlab.platypus import Table, TableStyle
 
+# Entry point group of packages with content element classes
+ELEMENT_PLUGINS_GROUP = 'pdfgeneration.elements'
+
+# Content element classes which can be used in page data by their class_name, see register_element
+ELEMENT_CLASSES: Dict[str, type] = {}
+_plugins_loaded = False
+
+
+def register_element(element_class: type) -> type:
+    """
+    A class decorator which makes a content element class available to page data by its class_name.
+    Attributes which can be set from the page data should be declared in __slots__.
+    :param element_class: a concrete subclass of ContentElement
+    :return: the class
+    """
+    if not isinstance(element_class, type) or not issubclass(element_class, ContentElement):
+        raise TypeError('{!r} is not a ContentElement subclass'.format(element_class))
+    if element_class.__abstractmethods__:
+        raise TypeError('{} does not implement {}'.format(element_class.__name__,
+                                                          ', '.join(sorted(element_class.__abstractmethods__))))
+    name = element_class.__name__
+    registered = ELEMENT_CLASSES.get(name)
+    if registered is not None and registered is not element_class:
+        raise ValueError('class_name {!r} is already registered by {}.{}'.format(name, registered.__module__,
+                                                                                registered.__qualname__))
+    ELEMENT_CLASSES[name] = element_class
+    return element_class
+
+
+def load_element_plugins(group=ELEMENT_PLUGINS_GROUP) -> List[str]:
+    """
+    Registers content elements of installed packages. A package declares an entry point which refers
+    to an element class or to a module which registers its classes with register_element:
+    [project.entry-points."pdfgeneration.elements"]
+    acme = "acme_reports.elements:AcmeHeaderElement"
+    :param group: the entry point group
+    :return: names of loaded entry points
+    """
+    global _plugins_loaded
+    loaded = []
+    for entry_point in entry_points(group=group):
+        try:
+            plugin = entry_point.load()
+        except Exception as e:
+            raise RuntimeError('content element plugin {!r} cannot be loaded: {}'.format(entry_point.name, e)) from e
+        if isinstance(plugin, type):
+            register_element(plugin)
+        loaded.append(entry_point.name)
+    if group == ELEMENT_PLUGINS_GROUP:
+        _plugins_loaded = True
+    return loaded
+
+
+def get_element_class(class_name):
+    """
+    :param class_name: class_name of a content element in page data
+    :return: the registered class or None. Plugins are loaded on the first unknown name.
+    """
+    element_class = ELEMENT_CLASSES.get(class_name)
+    if element_class is None and not _plugins_loaded:
+        load_element_plugins()
+        element_class = ELEMENT_CLASSES.get(class_name)
+    return element_class
+
 
 class ContentElement(ABC):
     """
     This is an interface for each content element.
     """
+    __slots__ = ('mode', 'width', 'theme', 'styles', 'colors')
 
     def __init__(self, data, width=0, mode: PageMode = PageMode.light):
         """
@@ -19,10 +95,17 @@ class ContentElement(ABC):
         """
         self.mode = mode
         self.width = width
-        self.styles = getStyleSheet(self.mode)
+        # the setup is shared by all elements of the class with the same mode and the theme of the document
+        plan = element_plans.get(type(self), mode, current_theme())
+        self.theme = plan.theme
+        self.styles = plan.styles
+        self.colors = plan.colors
+        fields = plan.fields
         for key, value in data.items():
-            if hasattr(self, key):
+            if key in fields:
                 setattr(self, key, value)
+                # stylesheets register their fonts, fonts of the markup are registered here
+                fonts.ensure_markup(value)
 
     @abstractmethod
     def get_content(self):
@@ -32,10 +115,41 @@ class ContentElement(ABC):
         pass
 
 
-class CategoryElement(ContentElement):
+class CachedDrawingElement(ContentElement):
+    """
+    An interface for content elements which are drawings depending only on the element data, mode, theme and width.
+    Drawings are cached and shared by all pages and documents.
+    """
+    __slots__ = ()
+
+    def get_content(self):
+        """
+        :return: a flowable for the cached drawing
+        """
+        return SharedDrawing(drawing_cache.get((type(self), self.mode, self.theme, self.width, *self.get_cache_key()),
+                                               self.get_drawing))
+
+    @abstractmethod
+    def get_cache_key(self) -> tuple:
+        """
+        :return: the element data used by the drawing. It should be hashable.
+        """
+        pass
+
+    @abstractmethod
+    def get_drawing(self) -> Drawing:
+        """
+        Each child element should implement its drawing.
+        """
+        pass
+
+
+@register_element
+class CategoryElement(CachedDrawingElement):
     """
     Page category realisation.
     """
+    __slots__ = ('name', 'h_padding', 'v_padding')
 
     def __init__(self, data, mode: PageMode,
                  h_padding=6,
@@ -52,21 +166,25 @@ class CategoryElement(ContentElement):
         self.v_padding = v_padding
         super().__init__(data, 0, mode)
 
-    def get_content(self):
+    def get_cache_key(self):
+        return self.name, self.h_padding, self.v_padding
+
+    def get_drawing(self):
         """
         :return: Drawing for the category.
         """
-        # defining color. The color depends on the page mode.
-        fill_color = '#EDEDED' if self.mode == PageMode.light else '#ADC3CA'
+        # defining color. The color depends on the page mode and the theme.
+        fill_color = self.colors.category_fill
         #define styles for the category
         style = self.styles['Category']
         text_color = getattr(style, 'textColor', None)
         font_name = getattr(style, 'fontName', None)
         font_size = getattr(style, 'fontSize', None)
-        s = String(self.h_padding, self.v_padding, self.name.upper(), fontSize=font_size,
+        name = self.name.upper()
+        s = String(self.h_padding, self.v_padding, name, fontSize=font_size,
                    fillColor=text_color,
                    fontName=font_name)
-        width = s.getEast() + self.h_padding
+        width = self.h_padding + string_width(name, font_name, font_size) + self.h_padding
         height = font_size + self.v_padding * 2 - 2
         d = Drawing(width, height)
         # draw box around category using width of the string
@@ -75,10 +193,13 @@ class CategoryElement(ContentElement):
         return d
 
 
-class HeaderElement(ContentElement):
+@register_element
+class HeaderElement(CachedDrawingElement):
     """
     The header element draws breadcrumbs, a line and a page number.
     """
+    __slots__ = ('breadcrumbs', 'page_number')
+
     def __init__(self, data, width, page_number, mode: PageMode):
         """
         :param data: a dictionary about the header
@@ -92,7 +213,10 @@ class HeaderElement(ContentElement):
         # calling a parent constructor to initialise all attributes
         super().__init__(data, width, mode)
 
-    def get_content(self):
+    def get_cache_key(self):
+        return tuple(self.breadcrumbs), self.page_number
+
+    def get_drawing(self):
         """
         :return: Drawing for the Header.
         """
@@ -104,7 +228,7 @@ class HeaderElement(ContentElement):
         elements_width = 0
         between_text_space_width = 10
         text_font_size = getattr(breadcrumbs_style, 'fontSize', None)
-        text_font_name = 'NeueMontreal'
+        text_font_name = self.theme.fonts.regular
         breadcrumbs_text_color = getattr(breadcrumbs_style, 'textColor', None)
         normal_text_color = getattr(normal_style, 'textColor', None)
         page_number_text_color = getattr(page_number_style, 'textColor', None)
@@ -113,7 +237,8 @@ class HeaderElement(ContentElement):
         middle_y = 4  # Adjust the y-coordinate for the circles
         page_number_width = 40
 
-        # breadcrumbs drawing
+        # breadcrumbs drawing, all breadcrumbs are measured at once
+        breadcrumbs_widths = measure_many(self.breadcrumbs, text_font_name, text_font_size)
         for i, item in enumerate(self.breadcrumbs):
             last_item = i == len(self.breadcrumbs) - 1
             s = String(elements_width, 0, item, fontSize=text_font_size,
@@ -121,7 +246,7 @@ class HeaderElement(ContentElement):
                        fontName=text_font_name)
             d.add(s)
             # calculation of the breadcrumbs' width.
-            elements_width = s.getEast() + between_text_space_width
+            elements_width = elements_width + breadcrumbs_widths[i] + between_text_space_width
 
             # delimiter between breadcrumbs
             if not last_item:
@@ -143,10 +268,13 @@ class HeaderElement(ContentElement):
         return d
 
 
+@register_element
 class BodyElement(ContentElement):
     """
     Drawing for the regular page body.
     """
+    __slots__ = ('text', 'title', 'subtitle', 'page_number')
+
     def __init__(self, data, width, page_number, mode: PageMode):
         """
         :param data: a dictionary with all body attributes
@@ -169,38 +297,29 @@ class BodyElement(ContentElement):
 
     def get_content(self):
         """
-        :return: drawing for the body
+        :return: a flow of the title and the text in two balanced columns, the text which does not fit
+        is continued on the next page
         """
-        # splitting a text to two columns
-        first_text, second_text = split_text(self.text)
-
         # Create a new content element to draw a subtitle
         subtitle = SubtitleElement(self.subtitle, self.page_number, self.mode).get_content()
 
-        # data for the table
-        content_table_body = [
-            [subtitle, ''],
-            [Paragraph(first_text, self.styles['BodyText']), Paragraph(second_text, self.styles['BodyText'])]
-        ]
-        # creating and styling a table for the body
-        content_table = Table(content_table_body, colWidths=[self.__column_width - 10, self.__column_width - 10],
-                              rowHeights=(30, 300))
-        content_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP')]))
-
-        # Define body content
-        body_content = [[Paragraph(self.title, self.styles['Heading1']),
-                         content_table]]
-        body_table = Table(body_content, colWidths=[self.__column_width, self.__column_width * 2])
-        body_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (0, -1), 'TOP')]))
-        return body_table
+        return ColumnFlow(Paragraph(self.text, self.styles['BodyText']),
+                          side=Paragraph(self.title, self.styles['Heading1']),
+                          heading=subtitle,
+                          side_width=self.__column_width,
+                          heading_height=30,
+                          column_count=2,
+                          column_gap=12,
+                          right_padding=12)
 
 
+@register_element
 class BodyStatementElement(BodyElement):
     """
      Drawing for the regular page body with a statement.
     """
+    __slots__ = ()
+
     def __init__(self, data, width, page_number, mode: PageMode):
         """
         :param data: a dictionary with all body attributes
@@ -235,10 +354,12 @@ class BodyStatementElement(BodyElement):
         return content_table
 
 
-class SubtitleElement(ContentElement):
+class SubtitleElement(CachedDrawingElement):
     """
      A drawing for the subtitle on the page's body.
     """
+    __slots__ = ('text', 'page_number')
+
     def __init__(self, text, page_number, mode: PageMode):
         """
         :param text: text for the subtitle
@@ -250,7 +371,10 @@ class SubtitleElement(ContentElement):
         # calling a parent constructor to initialise all attributes
         super().__init__({}, 0, mode)
 
-    def get_content(self):
+    def get_cache_key(self):
+        return self.text, self.page_number
+
+    def get_drawing(self):
         """
         :return: A drawing that consists from two elements a page number and a title
         """
@@ -266,12 +390,13 @@ class SubtitleElement(ContentElement):
         title_font_name = getattr(title_style, 'fontName', None)
         title_font_size = getattr(title_style, 'fontSize', None)
         # a drawing for the page number
-        s = String(0, title_font_size - page_number_font_size, '{}/'.format(self.page_number),
+        page_number = '{}/'.format(self.page_number)
+        s = String(0, title_font_size - page_number_font_size, page_number,
                    fontSize=page_number_font_size,
                    fillColor=page_number_text_color,
                    fontName=page_number_font_name)
         # calculation of the width to add a title
-        width = s.getEast() + h_padding
+        width = string_width(page_number, page_number_font_name, page_number_font_size) + h_padding
         # a drawing for the title
         st = String(width, 0, self.text, fontSize=title_font_size,
                     fillColor=title_text_color,
@@ -283,10 +408,13 @@ class SubtitleElement(ContentElement):
         return d
 
 
+@register_element
 class FooterElement(ContentElement):
     """
     A drawing for the regular footer.
     """
+    __slots__ = ('images', 'text')
+
     def __init__(self, data, width, mode: PageMode):
         """
         :param data: a dictionary with all body attributes
@@ -308,17 +436,24 @@ class FooterElement(ContentElement):
         text_content = Paragraph(self.text.upper(), self.styles['FooterText'])
         footer_content = [[text_content]]
 
-        # a drawing for the images
+        # a drawing for the images. Decoded images are shared by all footers and documents with the same profile.
+        profile = current_profile()
         for image in self.images:
-            footer_content[0].append(Image(image, width=174, height=171, kind='proportional'))
+            footer_content[0].append(image_cache.get_image(image, width=174, height=171, kind='proportional',
+                                                           dpi=profile.image_dpi, quality=profile.image_quality))
         footer_table = Table(footer_content, colWidths=[column_width, column_width, column_width])
         return footer_table
 
 
+@register_element
 class FooterTestsElement(FooterElement):
     """
     A drawing for the footer with the test results.
     """
+    __slots__ = ('headers', 'rows')
+    # tables with more rows are streamed and can be continued on the next pages
+    STREAMING_ROWS = 20
+
     def __init__(self, data, width, mode: PageMode):
         """
         :param data: a dictionary with all body attributes
@@ -341,15 +476,43 @@ class FooterTestsElement(FooterElement):
 
         # generation of a header and cells for the table
         headers_content = [Paragraph(item.upper(), self.styles['FooterText']) for item in self.headers]
+        if len(self.rows) > self.STREAMING_ROWS:
+            return self.__get_streaming_table(text_content, headers_content, column_width)
         rows_content = [[Paragraph(cell, self.styles['SmallText']) for cell in item] for item in self.rows]
         footer_content = [[text_content, '', ''],
                           [*headers_content],
                           *rows_content
                           ]
         footer_table = Table(footer_content, colWidths=[column_width, column_width, column_width])
-        white_with_opacity = colors.Color(1, 1, 1, alpha=0.1)
+        rule_color = self.colors.rule
         footer_table.setStyle(TableStyle([
-            ('LINEBELOW', (0, 1), (-1, -1), 1, white_with_opacity),
+            ('LINEBELOW', (0, 1), (-1, -1), 1, rule_color),
             ('VALIGN', (0, 0), (-1, -1), 'TOP'),
         ]))
         return footer_table
+
+    def __get_streaming_table(self, text_content, headers_content, column_width):
+        """
+        :return: a table which creates cells of rows only when they are laid out. Short cells are plain strings,
+        the headers are repeated on the next pages.
+        """
+        col_widths = [column_width, column_width, column_width]
+        style = self.styles['SmallText']
+        return StreamingTable([[text_content, '', ''], [*headers_content]], self.rows,
+                              lambda row: make_cells(row, style, col_widths), col_widths,
+                              self.__get_streaming_table_style, style)
+
+    def __get_streaming_table_style(self, head_count, row_count):
+        """
+        :param head_count: number of head rows in a part of the table
+        :param row_count: number of rows in a part of the table
+        :return: style commands for the part, plain strings are drawn as paragraphs of the SmallText style
+        """
+        style = self.styles['SmallText']
+        rule_color = self.colors.rule
+        return [
+            ('LINEBELOW', (0, head_count - 1), (-1, -1), 1, rule_color),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONT', (0, head_count), (-1, -1), style.fontName, style.fontSize, style.leading),
+            ('TEXTCOLOR', (0, head_count), (-1, -1), style.textColor),
+        ]
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+from weakref import WeakKeyDictionary
+
+import reportlab
+from reportlab import rl_config
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFace, TTEncoding
+
+FONTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'fonts')
+
+# font names in paragraph markup, e.g. <font face="NeueMontrealBold"> or <span fontName='ZagmaMonoTrial'>
+_MARKUP_FONT = re.compile(r'''\b(?:face|fontName|fontname)\s*=\s*["']?([^"'\s>]+)''')
+
+
+class FontRegistry():
+    """
+    This class declares fonts used by the documents and registers them lazily on the first use.
+    Parsed fonts can be persisted to a cache directory, so other processes load them without parsing TTF files.
+    """
+    def __init__(self, fonts: dict, cache_dir=None):
+        """
+        :param fonts: dictionary of font names and paths to TTF files
+        :param cache_dir: directory for parsed fonts. Parsed fonts are not persisted if it is None.
+        """
+        self.fonts = fonts
+        self.cache_dir = cache_dir
+        self.__registered = set()
+        self.__lock = threading.Lock()
+
+    def ensure(self, *names):
+        """
+        Registers declared fonts which are not registered yet.
+        Unknown names are ignored, they may be standard or already registered fonts.
+        :param names: font names
+        """
+        missing = [name for name in names if name in self.fonts and name not in self.__registered]
+        if not missing:
+            return
+        with self.__lock:
+            for name in missing:
+                if name not in self.__registered:
+                    pdfmetrics.registerFont(self.__load(name))
+                    self.__registered.add(name)
+
+    def ensure_markup(self, value):
+        """
+        Registers declared fonts used by tags of paragraph markup, e.g. when a content element is created.
+        :param value: a text with markup or a list of texts, other values are ignored
+        """
+        if isinstance(value, str):
+            if '=' in value:
+                self.ensure(*_MARKUP_FONT.findall(value))
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                self.ensure_markup(item)
+
+    def declare(self, name, filename):
+        """
+        Declares a font which is registered on the first use, e.g. a font of a theme.
+        :param name: font name
+        :param filename: path to the TTF file
+        """
+        with self.__lock:
+            if name in self.__registered and self.fonts.get(name) != filename:
+                raise ValueError('font {!r} is already registered from {}'.format(name, self.fonts[name]))
+            self.fonts[name] = filename
+
+    def register_all(self):
+        """
+        Registers all declared fonts, e.g. at startup of a long-lived worker.
+        """
+        self.ensure(*self.fonts)
+
+    def __cache_path(self, name, filename):
+        """
+        :return: path of the cache file. It changes if the TTF file or the reportlab version are changed.
+        """
+        stat = os.stat(filename)
+        key = '{}:{}:{}:{}'.format(os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, reportlab.Version)
+        return os.path.join(self.cache_dir, '{}-{}.pickle'.format(name, hashlib.sha1(key.encode()).hexdigest()))
+
+    def __load(self, name) -> TTFont:
+        """
+        :return: a font loaded from the cache or parsed from the TTF file
+        """
+        filename = self.fonts[name]
+        if self.cache_dir is None:
+            return TTFont(name, filename)
+
+        cache_path = self.__cache_path(name, filename)
+        try:
+            with open(cache_path, 'rb') as f:
+                return font_from_face(name, pickle.load(f))
+        except (OSError, pickle.UnpicklingError, EOFError, TypeError):
+            pass
+
+        font = TTFont(name, filename)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # a temporary file is renamed, so concurrent processes never read a partial cache file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(font.face, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return font
+
+
+def font_from_face(name, face: TTFontFace) -> TTFont:
+    """
+    Creates a font from an already parsed face the same way as TTFont.__init__ does after parsing of the file.
+    Subsets are still built per document from the face, so the face keeps the original font data.
+    """
+    if not isinstance(face, TTFontFace):
+        raise TypeError('{} is not a TTFontFace'.format(type(face).__name__))
+    font = TTFont.__new__(TTFont)
+    font.fontName = name
+    font.face = face
+    font.encoding = TTEncoding()
+    font.state = WeakKeyDictionary()
+    font._asciiReadable = rl_config.ttfAsciiReadable
+    return font
+
+
+# All fonts used by stylesheets, elements and page data markup.
+# The cache directory can be set with PDFGEN_FONT_CACHE_DIR environment variable.
+fonts = FontRegistry({
+    'NeueMontreal': os.path.join(FONTS_DIR, 'NeueMontreal-Regular.ttf'),
+    'NeueMontrealLight': os.path.join(FONTS_DIR, 'NeueMontreal-Light.ttf'),
+    'NeueMontrealMedium': os.path.join(FONTS_DIR, 'NeueMontreal-Medium.ttf'),
+    'NeueMontrealBold': os.path.join(FONTS_DIR, 'NeueMontreal-Bold.ttf'),
+    'ZagmaMonoTrial': os.path.join(FONTS_DIR, 'F37ZagmaMonoTrial-Regular.ttf'),
+}, cache_dir=os.environ.get('PDFGEN_FONT_CACHE_DIR'))
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from reportlab.pdfbase.pdfdoc import PDFResourceDictionary
+from reportlab.platypus import Flowable, Frame
+from reportlab.platypus.doctemplate import LayoutError
+
+from utils import normalize_data
+
+
+def page_key(data, width, profile='default', theme='') -> str:
+    """
+    :param data: dictionary with data about page
+    :param width: width of the page
+    :param profile: name of the output profile
+    :param theme: digest of the theme, see themes.theme_digest
+    :return: a stable key of the page content
+    """
+    content = json.dumps([normalize_data(data), width, profile, theme], sort_keys=True, ensure_ascii=False,
+                         separators=(',', ':'))
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class PageLayout():
+    """
+    Laid out flowables of a reusable page with their positions in the page frame.
+    Flowables keep results of their layout, so they can be drawn again without wrapping and splitting.
+    """
+    def __init__(self):
+        # (flowable, x, y, space for the horizontal alignment)
+        self.placements = []
+        # flowables set temporary attributes while they are drawn, so a layout is drawn by one thread at a time
+        self.lock = threading.Lock()
+
+    def draw(self, canv):
+        """
+        Draws all flowables at their positions.
+        """
+        with self.lock:
+            for flowable, x, y, sW in self.placements:
+                flowable.drawOn(canv, x, y, sW)
+
+
+class _Placement(Flowable):
+    """
+    A proxy which records the position of the wrapped flowable when the frame draws it.
+    All other attributes are delegated to the wrapped flowable the same way as TopPadder does it.
+    """
+    def __init__(self, flowable, layout: PageLayout):
+        self.__dict__['_Placement__f'] = flowable
+        self.__dict__['_Placement__layout'] = layout
+
+    def wrap(self, aW, aH):
+        return self.__f.wrap(aW, aH)
+
+    def split(self, aW, aH):
+        return self.__f.split(aW, aH)
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        self.__layout.placements.append((self.__f, x, y, _sW))
+        self.__f.drawOn(canvas, x, y, _sW)
+
+    def __setattr__(self, a, v):
+        setattr(self.__f, a, v)
+
+    def __getattr__(self, a):
+        return getattr(self.__f, a)
+
+    def __delattr__(self, a):
+        delattr(self.__f, a)
+
+
+class PageFragmentCache():
+    """
+    LRU cache of laid out reusable pages, it is shared by documents.
+    """
+    def __init__(self, max_entries=256):
+        """
+        :param max_entries: the maximal number of cached pages
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.__layouts = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key) -> Optional[PageLayout]:
+        """
+        :param key: a key of the page
+        :return: the cached layout or None
+        """
+        with self.__lock:
+            layout = self.__layouts.get(key)
+            if layout is None:
+                self.misses += 1
+                return None
+            self.__layouts.move_to_end(key)
+            self.hits += 1
+            return layout
+
+    def put(self, key, layout: PageLayout):
+        """
+        :param key: a key of the page
+        :param layout: a laid out page
+        """
+        with self.__lock:
+            self.__layouts[key] = layout
+            if len(self.__layouts) > self.max_entries:
+                self.__layouts.popitem(last=False)
+
+    def clear(self):
+        """
+        Drops all cached pages and resets counters.
+        """
+        with self.__lock:
+            self.__layouts.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.__layouts)
+
+
+class PageFragment(Flowable):
+    """
+    The whole content of a reusable page. The page is laid out once and cached,
+    other documents only draw the laid out flowables. In a document the page is drawn once into a form XObject,
+    and all occurrences of the page refer to it. The page background is drawn by the page template as usual.
+    """
+    def __init__(self, key, story_factory: Callable[[], List[Flowable]], cache: PageFragmentCache):
+        """
+        :param key: a key of the page content
+        :param story_factory: a function which returns the story of the page, it is called only for the layout
+        :param cache: cache of laid out pages
+        """
+        super().__init__()
+        self.key = key
+        self.story_factory = story_factory
+        self.cache = cache
+
+    def wrap(self, availWidth, availHeight):
+        # the fragment takes the whole frame, the page content is laid out in the same space
+        self.width = availWidth
+        self.height = availHeight
+        return availWidth, availHeight
+
+    def draw(self):
+        canv = self.canv
+        name = 'page_' + self.key
+        if not canv.hasForm(name):
+            # the bounding box does not clip content which is drawn outside of the frame
+            canv.beginForm(name, -self.width, -self.height, self.width * 2, self.height * 2)
+            layout = self.cache.get(self.key)
+            if layout is None:
+                self.cache.put(self.key, self.__layout(canv))
+            else:
+                layout.draw(canv)
+            canv.endForm()
+            _set_form_resources(canv, name)
+        canv.doForm(name)
+
+    def __layout(self, canv) -> PageLayout:
+        """
+        Lays out and draws the page story, positions of flowables are recorded.
+        :return: the laid out page
+        """
+        layout = PageLayout()
+        story = [_Placement(flowable, layout) for flowable in self.story_factory()]
+        frame = Frame(0, 0, self.width, self.height, leftPadding=0, bottomPadding=0, rightPadding=0, topPadding=0)
+        with layout.lock:
+            frame.addFromList(story, canv)
+        if story:
+            raise LayoutError('Reusable page {} does not fit on one page'.format(self.key))
+        return layout
+
+
+def _set_form_resources(canv, name):
+    """
+    Declares resources of the form like reportlab does it for pages.
+    Reportlab forms do not declare graphics states, so transparent colors would be lost.
+    """
+    form = canv._doc.idToObject[canv._doc.getXObjectName(name)]
+    resources = PDFResourceDictionary()
+    resources.basicFonts()
+    resources.allProcs()
+    if form.XObjects:
+        resources.XObject = form.XObjects
+    if form.ExtGState:
+        resources.ExtGState = form.ExtGState
+    form.Resources = resources
@@ -0,0 +1,168 @@
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image as PILImage
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Image
+
+from instrumentation import current_stats, span_of
+
+
+class SharedImageReader(ImageReader):
+    """
+    An image reader over in-memory bytes. It is decoded once and can be shared between documents and threads.
+    Documents embed the same reader as a single image XObject, because reportlab names XObjects by image data.
+    """
+    def __init__(self, data: bytes):
+        """
+        :param data: encoded image
+        """
+        self.data = data
+        super().__init__(BytesIO(data))
+        self.__is_jpeg = getattr(self._image, 'format', None) == 'JPEG'
+        if self.__is_jpeg:
+            # every document gets its own file handle, a shared one would be moved by concurrent builds
+            self.jpeg_fh = self.__jpeg_fh
+            # JPEG images have no alpha channel, reportlab sets it when the image is decoded
+            self._dataA = None
+        else:
+            # decoding of the image, the data is kept by the reader
+            self.getRGBData()
+
+    def __jpeg_fh(self):
+        return BytesIO(self.data)
+
+    def getRGBData(self):
+        """
+        :return: decoded pixels of the image. JPEG data is embedded without decoding and reportlab uses
+        this data only to name the image XObject, so the encoded data is returned for JPEG images.
+        """
+        if self.__is_jpeg:
+            return self.data
+        return super().getRGBData()
+
+    @property
+    def size_in_memory(self):
+        """
+        :return: approximate number of bytes kept by the reader
+        """
+        return len(self.data) + len(self._data or b'')
+
+
+class CachedImage(Image):
+    """
+    An image flowable drawing a shared image reader. It never opens or decodes the image file.
+    """
+    def __init__(self, reader: SharedImageReader, width=None, height=None, kind='direct', hAlign='CENTER'):
+        """
+        :param reader: a shared image reader
+        :param width: width of the image
+        :param height: height of the image
+        :param kind: the same as for reportlab Image
+        :param hAlign: horizontal alignment
+        """
+        self._img = reader
+        super().__init__(reader.fp, width, height, kind, hAlign=hAlign)
+
+
+class ImageCache():
+    """
+    LRU cache of decoded images. Images are keyed by path, modification time and target size,
+    so a changed file is read again.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, dpi=None, quality=85):
+        """
+        :param max_bytes: the upper bound for bytes kept by all cached images
+        :param dpi: resolution for the target size. Bigger images are downsampled to this resolution.
+        Images are kept in the original resolution if it is None.
+        :param quality: JPEG quality for downsampled images
+        """
+        self.max_bytes = max_bytes
+        self.dpi = dpi
+        self.quality = quality
+        self.hits = 0
+        self.misses = 0
+        self.__size = 0
+        self.__readers = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, path, width, height, dpi=None, quality=None) -> SharedImageReader:
+        """
+        :param path: path to the image file
+        :param width: target width of the image in points
+        :param height: target height of the image in points
+        :param dpi: resolution for the target size instead of the resolution of the cache, e.g. of an output profile
+        :param quality: JPEG quality for downsampled images instead of the quality of the cache
+        :return: a shared image reader
+        """
+        dpi = self.dpi if dpi is None else dpi
+        quality = self.quality if quality is None else quality
+        # the quality is used only for downsampled images
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns, width, height, dpi,
+               quality if dpi is not None else None)
+        with self.__lock:
+            reader = self.__readers.get(key)
+            if reader is not None:
+                self.__readers.move_to_end(key)
+                self.hits += 1
+                return reader
+            self.misses += 1
+
+        with span_of(current_stats(), 'images.load'):
+            reader = SharedImageReader(self.__read(path, width, height, dpi, quality))
+        with self.__lock:
+            if key not in self.__readers:
+                self.__readers[key] = reader
+                self.__size += reader.size_in_memory
+                # eviction of the least recently used images, the last one is kept anyway
+                while self.__size > self.max_bytes and len(self.__readers) > 1:
+                    _, evicted = self.__readers.popitem(last=False)
+                    self.__size -= evicted.size_in_memory
+        return reader
+
+    def get_image(self, path, width, height, kind='proportional', dpi=None, quality=None) -> CachedImage:
+        """
+        :return: an image flowable for the cached image
+        """
+        return CachedImage(self.get(path, width, height, dpi, quality), width, height, kind)
+
+    def __read(self, path, width, height, dpi, quality) -> bytes:
+        """
+        :return: bytes of the image file or of the downsampled image
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if dpi is None:
+            return data
+
+        image = PILImage.open(BytesIO(data))
+        # the image is fitted to the target size keeping the proportions, as Image(kind='proportional') does
+        factor = min(width / image.width, height / image.height) * dpi / 72
+        if factor >= 1:
+            return data
+        size = (max(1, round(image.width * factor)), max(1, round(image.height * factor)))
+        image = image.resize(size, PILImage.LANCZOS)
+        out = BytesIO()
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image.save(out, 'PNG', optimize=True)
+        else:
+            image.save(out, 'JPEG', quality=quality, optimize=True)
+        return out.getvalue()
+
+    def clear(self):
+        """
+        Drops all cached images and resets counters.
+        """
+        with self.__lock:
+            self.__readers.clear()
+            self.__size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.__readers)
+
+
+image_cache = ImageCache()
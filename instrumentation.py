@@ -0,0 +1,160 @@
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from reportlab.platypus import Flowable
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_current_stats: ContextVar[Optional['BuildStats']] = ContextVar('build_stats', default=None)
+
+
+def current_stats() -> Optional['BuildStats']:
+    """
+    :return: stats of the document being built in the current thread or None if instrumentation is disabled
+    """
+    return _current_stats.get()
+
+
+def span_of(stats: Optional['BuildStats'], name):
+    """
+    :param stats: stats of the build or None if instrumentation is disabled
+    :param name: name of the span
+    :return: a context manager which measures time of the block, it does nothing if stats is None
+    """
+    return nullcontext() if stats is None else stats.span(name)
+
+
+class BuildStats():
+    """
+    This class collects timing spans, counters and peak memory of document builds.
+    Pass it to DocumentGenerator to enable instrumentation, it is disabled by default.
+    """
+    def __init__(self, callback: Optional[Callable[[str, str, float], None]] = None, trace_memory=False):
+        """
+        :param callback: a function called with ('span', name, seconds) for each span and with
+        ('count', name, increment) for each counter update, e.g. to feed a metrics pipeline
+        :param trace_memory: trace the peak of memory allocated by Python during the build with tracemalloc.
+        It slows down the build noticeably.
+        """
+        self.callback = callback
+        self.trace_memory = trace_memory
+        # span name: [number of spans, total seconds, max seconds]
+        self.spans = {}
+        self.counters = defaultdict(int)
+        self.peak_traced_memory = None
+        self.peak_rss = None
+
+    @contextmanager
+    def span(self, name):
+        """
+        Measures time of the block.
+        :param name: name of the span like 'element.BodyElement'
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, duration):
+        """
+        :param name: name of the span
+        :param duration: time in seconds
+        """
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [1, duration, duration]
+        else:
+            span[0] += 1
+            span[1] += duration
+            if duration > span[2]:
+                span[2] = duration
+        if self.callback is not None:
+            self.callback('span', name, duration)
+
+    def count(self, name, increment=1):
+        """
+        :param name: name of the counter like 'pages'
+        :param increment: value added to the counter
+        """
+        self.counters[name] += increment
+        if self.callback is not None:
+            self.callback('count', name, increment)
+
+    @contextmanager
+    def activate(self):
+        """
+        Makes the stats current for the block, so all instrumented code in the thread reports to them.
+        """
+        token = _current_stats.set(self)
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if self.trace_memory and tracemalloc.is_tracing():
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peak_traced_memory = max(peak, self.peak_traced_memory or 0)
+            if started_tracing:
+                tracemalloc.stop()
+            if resource is not None:
+                # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+                rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                self.peak_rss = rss if sys.platform == 'darwin' else rss * 1024
+            _current_stats.reset(token)
+
+    def as_dict(self):
+        """
+        :return: all collected data as a dictionary which can be dumped as JSON
+        """
+        return {'spans': {name: {'count': count, 'total': total, 'max': maximum}
+                          for name, (count, total, maximum) in self.spans.items()},
+                'counters': dict(self.counters),
+                'peak_traced_memory': self.peak_traced_memory,
+                'peak_rss': self.peak_rss}
+
+
+class TimedFlowable(Flowable):
+    """
+    A proxy which measures layout and drawing time of the wrapped flowable.
+    All other attributes are delegated to the wrapped flowable the same way as TopPadder does it.
+    """
+    def __init__(self, flowable, name, stats: BuildStats):
+        """
+        :param flowable: a flowable to measure
+        :param name: name of the span
+        :param stats: stats for the spans
+        """
+        self.__dict__['_TimedFlowable__f'] = flowable
+        self.__dict__['_TimedFlowable__name'] = name
+        self.__dict__['_TimedFlowable__stats'] = stats
+
+    def wrap(self, aW, aH):
+        with self.__stats.span(self.__name):
+            return self.__f.wrap(aW, aH)
+
+    def split(self, aW, aH):
+        with self.__stats.span(self.__name):
+            return self.__f.split(aW, aH)
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        with self.__stats.span(self.__name):
+            self.__f.drawOn(canvas, x, y, _sW)
+
+    def __setattr__(self, a, v):
+        setattr(self.__f, a, v)
+
+    def __getattr__(self, a):
+        return getattr(self.__f, a)
+
+    def __delattr__(self, a):
+        delattr(self.__f, a)
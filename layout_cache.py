@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing
+from reportlab.platypus import Flowable
+
+# reportlab renderer sets temporary attributes on the drawing, so a shared drawing is rendered by one thread at a time
+_render_lock = threading.Lock()
+
+
+class SharedDrawing(Flowable):
+    """
+    A flowable which draws a cached drawing. The layout never changes the drawing,
+    so one drawing can be used by many pages and documents.
+    """
+    def __init__(self, drawing: Drawing):
+        """
+        :param drawing: a cached drawing
+        """
+        super().__init__()
+        self.drawing = drawing
+        self.width = drawing.width
+        self.height = drawing.height
+        self.hAlign = drawing.hAlign
+        self.vAlign = drawing.vAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        with _render_lock:
+            renderPDF.draw(self.drawing, self.canv, 0, 0)
+
+
+class DrawingCache():
+    """
+    LRU cache of drawings of content elements. Drawings are keyed by the data of the element, its mode, theme and width.
+    """
+    def __init__(self, max_entries=4096):
+        """
+        :param max_entries: the maximal number of cached drawings
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.__drawings = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Drawing]) -> Drawing:
+        """
+        :param key: a key of the drawing
+        :param factory: a function which creates the drawing if it is not cached
+        :return: a cached drawing
+        """
+        with self.__lock:
+            drawing = self.__drawings.get(key)
+            if drawing is not None:
+                self.__drawings.move_to_end(key)
+                self.hits += 1
+                return drawing
+            self.misses += 1
+
+        drawing = factory()
+        with self.__lock:
+            self.__drawings[key] = drawing
+            if len(self.__drawings) > self.max_entries:
+                self.__drawings.popitem(last=False)
+        return drawing
+
+    def clear(self):
+        """
+        Drops all cached drawings and resets counters.
+        """
+        with self.__lock:
+            self.__drawings.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.__drawings)
+
+
+drawing_cache = DrawingCache()
@@ -0,0 +1,195 @@
+import codecs
+import json
+import os
+from typing import Any, Iterator, List
+
+from model import PageData, PageDataError, load_pages
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, it only makes parsing faster
+    orjson = None
+
+_CHUNK_SIZE = 64 * 1024
+_JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+def _loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _iter_lines(stream) -> Iterator[Any]:
+    """
+    :param stream: a binary stream with one JSON value per line
+    :return: iterator of parsed values
+    """
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield _loads(line)
+        except ValueError as e:
+            raise ValueError('line {}: {}'.format(number, e)) from None
+
+
+def _iter_array(stream) -> Iterator[Any]:
+    """
+    Parses a JSON array item by item, so the whole array is never kept in memory.
+    :param stream: a binary stream with a JSON array
+    :return: iterator of parsed items
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    eof = False
+    chunk_size = _CHUNK_SIZE
+
+    def skip_whitespace():
+        nonlocal position
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+
+    def read_more():
+        nonlocal buffer, position, eof, chunk_size
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+            buffer = buffer[position:] + text_decoder.decode(b'', final=True)
+        else:
+            buffer = buffer[position:] + text_decoder.decode(chunk)
+            # a big item is parsed again after each read, reads grow to keep it linear
+            chunk_size *= 2
+        position = 0
+
+    def next_char():
+        skip_whitespace()
+        while position >= len(buffer) and not eof:
+            read_more()
+            skip_whitespace()
+        return buffer[position] if position < len(buffer) else ''
+
+    if next_char() != '[':
+        raise ValueError('a JSON array is expected')
+    position += 1
+    if next_char() == ']':
+        return
+    while True:
+        next_char()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+            # a number can be cut by the end of the buffer, it is complete only if something follows it
+            if end == len(buffer) and not eof:
+                read_more()
+                continue
+            break
+        chunk_size = _CHUNK_SIZE
+        position = end
+        yield item
+        separator = next_char()
+        position += 1
+        if separator == ']':
+            return
+        if not separator:
+            raise ValueError('unexpected end of the JSON array')
+        if separator != ',':
+            raise ValueError('"," or "]" is expected in the JSON array, got {!r}'.format(separator))
+
+
+def iter_documents(source, format='auto') -> Iterator[Any]:
+    """
+    Reads documents lazily from a JSONL file or a JSON array. Each document is a list of pages
+    or an object with "pages", e.g. a batch job {"output_filename": ..., "pages": [...]}.
+    :param source: a file name or a binary stream
+    :param format: 'jsonl', 'json' or 'auto'. In the auto mode .jsonl and .ndjson files are read as JSONL,
+    other sources are read as a JSON array if they start with "[" and as JSONL otherwise.
+    A stream with one page list per line should be read with the 'jsonl' format.
+    :return: iterator of parsed documents
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if format == 'auto' and str(source).endswith(_JSONL_EXTENSIONS):
+            format = 'jsonl'
+        with open(source, 'rb') as stream:
+            yield from iter_documents(stream, format)
+        return
+
+    if format == 'auto':
+        stream = source if hasattr(source, 'peek') else _PeekableStream(source)
+        head = stream.peek(_CHUNK_SIZE).lstrip()
+        while not head and stream.peek(1):
+            stream.read(_CHUNK_SIZE)
+            head = stream.peek(_CHUNK_SIZE).lstrip()
+        format = 'json' if head[:1] == b'[' else 'jsonl'
+        source = stream
+    if format == 'json':
+        yield from _iter_array(source)
+    elif format == 'jsonl':
+        yield from _iter_lines(source)
+    else:
+        raise ValueError('unknown format {!r}'.format(format))
+
+
+def load_document(document) -> List[PageData]:
+    """
+    :param document: a list of pages or an object with "pages" in the format of data.data_pages,
+    page modes are names of PageMode members
+    :return: validated pages ready to render
+    """
+    pages = document.get('pages') if isinstance(document, dict) else document
+    if not isinstance(pages, list):
+        raise PageDataError('a list of pages is expected')
+    return load_pages(pages)
+
+
+def iter_page_lists(source, format='auto') -> Iterator[List[PageData]]:
+    """
+    Reads documents lazily and validates their pages.
+    :param source: a file name or a binary stream
+    :param format: 'jsonl', 'json' or 'auto', see iter_documents
+    :return: iterator of validated page lists
+    """
+    for document in iter_documents(source, format):
+        yield load_document(document)
+
+
+class _PeekableStream():
+    """
+    A minimal wrapper for binary streams without peek (e.g. sockets), it keeps the peeked bytes.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = b''
+
+    def peek(self, size):
+        if len(self.buffer) < size:
+            self.buffer += self.stream.read(size - len(self.buffer))
+        return self.buffer
+
+    def read(self, size=-1):
+        if size < 0:
+            data, self.buffer = self.buffer + self.stream.read(), b''
+            return data
+        if not self.buffer:
+            return self.stream.read(size)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def __iter__(self):
+        rest = b''
+        while True:
+            chunk = self.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            lines = (rest + chunk).split(b'\n')
+            rest = lines.pop()
+            yield from lines
+        if rest:
+            yield rest
@@ -0,0 +1,153 @@
+import threading
+from typing import Iterable, List
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from fonts import fonts
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, widths are summed in pure Python without it
+    numpy = None
+
+# the table keeps glyph widths of the basic multilingual plane, other characters are looked up in the font
+_MAX_CODE_POINT = 0xFFFF
+
+# fewer characters are summed in pure Python, numpy calls cost more than they save for a few short strings
+_NUMPY_MIN_CHARS = 256
+
+
+class GlyphWidths():
+    """
+    Advance widths of glyphs of a TrueType font in 1/1000 of the font size, indexed by code points.
+    Widths of a string are summed in the same order as reportlab does it, so the results are the same as of stringWidth.
+    """
+    def __init__(self, font: TTFont):
+        """
+        :param font: a registered TrueType font
+        """
+        char_widths = font.face.charWidths
+        self.char_widths = char_widths
+        self.default_width = font.face.defaultWidth
+        size = min(max(char_widths, default=0), _MAX_CODE_POINT) + 1
+        widths = [self.default_width] * size
+        for code, width in char_widths.items():
+            if code < size:
+                widths[code] = width
+        self.widths = widths
+        self.array = numpy.array(widths, dtype=numpy.float64) if numpy is not None else None
+
+    def total(self, text) -> float:
+        """
+        :param text: a string
+        :return: the sum of advance widths of the string in 1/1000 of the font size
+        """
+        widths = self.widths
+        size = len(widths)
+        char_widths = self.char_widths
+        default_width = self.default_width
+        return sum([widths[code] if code < size else char_widths.get(code, default_width)
+                    for code in map(ord, text)])
+
+    def totals(self, strings: List[str]) -> List[float]:
+        """
+        Widths of many characters are looked up and summed by numpy. numpy sums long strings pairwise,
+        so the sums are the same as of total for fonts with integer widths, like the fonts of the reports,
+        and can differ in the last bits for other fonts.
+        :param strings: a list of strings
+        :return: sums of advance widths of the strings in 1/1000 of the font size
+        """
+        lengths = list(map(len, strings))
+        if self.array is None or sum(lengths) < _NUMPY_MIN_CHARS:
+            return [self.total(text) for text in strings]
+        codes = numpy.frombuffer(''.join(strings).encode('utf-32-le', 'surrogatepass'), dtype=numpy.uint32)
+        size = len(self.array)
+        widths = self.array[numpy.minimum(codes, size - 1)]
+        outside = codes >= size
+        if outside.any():
+            widths[outside] = [self.char_widths.get(code, self.default_width) for code in codes[outside].tolist()]
+        lengths = numpy.array(lengths, dtype=numpy.int64)
+        starts = numpy.cumsum(lengths) - lengths
+        # reduceat sums from each start to the next one, so empty strings are left out
+        filled = lengths > 0
+        totals = numpy.zeros(len(strings))
+        totals[filled] = numpy.add.reduceat(widths, starts[filled])
+        return totals.tolist()
+
+
+class FontMetrics():
+    """
+    Tables of glyph widths for measurement of strings. A table is built once per font and shared by all sizes.
+    Fonts which are not TrueType fonts are measured by reportlab.
+    """
+    def __init__(self):
+        self.__tables = {}
+        self.__lock = threading.Lock()
+
+    def get(self, font_name):
+        """
+        :param font_name: name of a font
+        :return: a table of glyph widths or None if the font is not a TrueType font
+        """
+        try:
+            return self.__tables[font_name]
+        except KeyError:
+            pass
+        with self.__lock:
+            if font_name not in self.__tables:
+                fonts.ensure(font_name)
+                font = pdfmetrics.getFont(font_name)
+                self.__tables[font_name] = GlyphWidths(font) if isinstance(font, TTFont) else None
+            return self.__tables[font_name]
+
+    def string_width(self, text, font_name, font_size) -> float:
+        """
+        :param text: a string
+        :param font_name: name of a font
+        :param font_size: size of the font
+        :return: width of the string in points
+        """
+        table = self.get(font_name)
+        if table is None:
+            return pdfmetrics.stringWidth(text, font_name, font_size)
+        return 0.001 * font_size * table.total(text)
+
+    def measure_many(self, strings: Iterable[str], font_name, font_size) -> List[float]:
+        """
+        Measures many strings at once, widths of many characters are summed by numpy if it is installed.
+        :param strings: strings to measure
+        :param font_name: name of a font
+        :param font_size: size of the font
+        :return: widths of the strings in points
+        """
+        strings = list(strings)
+        table = self.get(font_name)
+        if table is None:
+            return [pdfmetrics.stringWidth(text, font_name, font_size) for text in strings]
+        scale = 0.001 * font_size
+        return [scale * total for total in table.totals(strings)]
+
+    def clear(self):
+        """
+        Drops all tables, e.g. after a font is registered again with another file.
+        """
+        with self.__lock:
+            self.__tables.clear()
+
+
+font_metrics = FontMetrics()
+
+
+def string_width(text, font_name, font_size) -> float:
+    """
+    :return: width of the string in points, see FontMetrics.string_width
+    """
+    return font_metrics.string_width(text, font_name, font_size)
+
+
+def measure_many(strings: Iterable[str], font_name, font_size) -> List[float]:
+    """
+    :return: widths of the strings in points, see FontMetrics.measure_many
+    """
+    return font_metrics.measure_many(strings, font_name, font_size)
@@ -0,0 +1,214 @@
+import os
+from typing import Callable, Dict, Iterable, List, Optional
+
+from elements import ContentElement, HeaderElement, CategoryElement, BodyElement, FooterElement, get_element_class
+from plans import element_fields
+from utils import PageMode
+
+# Content elements of a page and the base classes of elements which can be used for them
+PAGE_ELEMENTS = {
+    'header': HeaderElement,
+    'category': CategoryElement,
+    'body': BodyElement,
+    'footer': FooterElement,
+}
+
+
+class PageDataError(ValueError):
+    """
+    Raised when page data does not match the structure expected by pages and content elements.
+    """
+    pass
+
+
+def _type_name(value):
+    return type(value).__name__
+
+
+def _check_string(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return 'a string is expected, got {}'.format(_type_name(value))
+
+
+def _check_strings(value) -> Optional[str]:
+    if not isinstance(value, (list, tuple)):
+        return 'a list of strings is expected, got {}'.format(_type_name(value))
+    for item in value:
+        if not isinstance(item, str):
+            return 'a list of strings is expected, got an item of {}'.format(_type_name(item))
+
+
+def _check_rows(value) -> Optional[str]:
+    if not isinstance(value, (list, tuple)):
+        return 'a list of rows is expected, got {}'.format(_type_name(value))
+    for row in value:
+        error = _check_strings(row)
+        if error is not None:
+            return 'rows: ' + error
+
+
+def _check_images(value) -> Optional[str]:
+    error = _check_strings(value)
+    if error is not None:
+        return error
+    for path in value:
+        if not os.path.isfile(path):
+            return 'image {!r} does not exist'.format(path)
+
+
+def _check_number(value) -> Optional[str]:
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return 'a number is expected, got {}'.format(_type_name(value))
+
+
+def _check_page_number(value) -> Optional[str]:
+    if not isinstance(value, (int, str)) or isinstance(value, bool):
+        return 'a string or an integer is expected, got {}'.format(_type_name(value))
+
+
+# Checks of attribute values of content elements by the attribute name. A check returns an error message or None.
+# Attributes of plugin elements without a check are not validated, plugins can add their checks.
+ATTRIBUTE_CHECKS: Dict[str, Callable[[object], Optional[str]]] = {
+    'text': _check_string,
+    'title': _check_string,
+    'subtitle': _check_string,
+    'name': _check_string,
+    'breadcrumbs': _check_strings,
+    'headers': _check_strings,
+    'rows': _check_rows,
+    'images': _check_images,
+    'h_padding': _check_number,
+    'v_padding': _check_number,
+    'page_number': _check_page_number,
+}
+
+
+class ElementData():
+    """
+    Validated data of a content element: the resolved element class and its attributes.
+    """
+    __slots__ = ('element_class', 'attributes')
+
+    def __init__(self, element_class, attributes: dict):
+        """
+        :param element_class: a content element class
+        :param attributes: attributes of the element without class_name
+        """
+        self.element_class = element_class
+        self.attributes = attributes
+
+    @classmethod
+    def from_dict(cls, data: dict, base=ContentElement, path='element') -> 'ElementData':
+        """
+        :param data: a dictionary with class_name and attributes of the element
+        :param base: a base class which the element class should extend
+        :param path: a path of the element in the page data for error messages
+        :return: validated element data
+        """
+        if not isinstance(data, dict):
+            raise PageDataError('{}: a dictionary is expected, got {}'.format(path, type(data).__name__))
+        class_name = data.get('class_name')
+        element_class = get_element_class(class_name)
+        if element_class is None:
+            raise PageDataError('{}: unknown class_name {!r}'.format(path, class_name))
+        if not issubclass(element_class, base):
+            raise PageDataError('{}: {} cannot be used as {}'.format(path, class_name, base.__name__))
+        attributes = {key: value for key, value in data.items() if key != 'class_name'}
+        unknown = attributes.keys() - element_fields(element_class)
+        if unknown:
+            raise PageDataError('{}: unknown attributes {} for {}'.format(path, ', '.join(sorted(unknown)),
+                                                                           class_name))
+        for name, value in attributes.items():
+            check = ATTRIBUTE_CHECKS.get(name)
+            error = check(value) if check is not None else None
+            if error is not None:
+                raise PageDataError('{}.{}: {}'.format(path, name, error))
+        return cls(element_class, attributes)
+
+    def to_dict(self) -> dict:
+        """
+        :return: the element data as a dictionary in the format of data.data_pages
+        """
+        return {'class_name': self.element_class.__name__, **self.attributes}
+
+
+class PageData():
+    """
+    Validated data about a page. Pages and content elements are created from it without any checks.
+    """
+    __slots__ = ('page_number', 'mode', 'header', 'category', 'body', 'footer', 'reusable')
+
+    def __init__(self, page_number: int, mode: PageMode, header: ElementData, category: ElementData,
+                 body: ElementData, footer: ElementData, reusable=False):
+        """
+        :param page_number: number of the page
+        :param mode: page mode
+        :param header: header data
+        :param category: category data
+        :param body: body data
+        :param footer: footer data
+        :param reusable: the page has no customer-specific data and can be reused by documents
+        """
+        self.page_number = page_number
+        self.mode = mode
+        self.header = header
+        self.category = category
+        self.body = body
+        self.footer = footer
+        self.reusable = reusable
+
+    @classmethod
+    def from_dict(cls, data: dict, path='page') -> 'PageData':
+        """
+        :param data: a dictionary with data about page in the format of data.data_pages.
+        The mode can be a PageMode or its name.
+        :param path: a path of the page for error messages
+        :return: validated page data
+        """
+        if isinstance(data, PageData):
+            return data
+        if not isinstance(data, dict):
+            raise PageDataError('{}: a dictionary is expected, got {}'.format(path, type(data).__name__))
+        page_number = data.get('page_number')
+        if not isinstance(page_number, int) or isinstance(page_number, bool) or page_number < 0:
+            raise PageDataError('{}: page_number should be a non-negative integer, got {!r}'.format(path,
+                                                                                                 page_number))
+        mode = data.get('mode')
+        if isinstance(mode, str):
+            if mode not in PageMode.__members__:
+                raise PageDataError('{}: unknown mode {!r}'.format(path, mode))
+            mode = PageMode[mode]
+        elif not isinstance(mode, PageMode):
+            raise PageDataError('{}: mode should be a PageMode, got {!r}'.format(path, mode))
+        elements = {}
+        for name, base in PAGE_ELEMENTS.items():
+            if name not in data:
+                raise PageDataError('{}: {} is missing'.format(path, name))
+            elements[name] = ElementData.from_dict(data[name], base, '{}.{}'.format(path, name))
+        unknown = data.keys() - PageData.__slots__
+        if unknown:
+            raise PageDataError('{}: unknown keys {}'.format(path, ', '.join(sorted(unknown))))
+        return cls(page_number, mode, reusable=bool(data.get('reusable', False)), **elements)
+
+    def to_dict(self) -> dict:
+        """
+        :return: the page data as a dictionary in the format of data.data_pages
+        """
+        data = {'page_number': self.page_number,
+                'mode': self.mode,
+                'header': self.header.to_dict(),
+                'category': self.category.to_dict(),
+                'body': self.body.to_dict(),
+                'footer': self.footer.to_dict()}
+        if self.reusable:
+            data['reusable'] = True
+        return data
+
+
+def load_pages(pages: Iterable[dict]) -> List[PageData]:
+    """
+    Validates data about pages once, e.g. when a batch job is loaded.
+    :param pages: data about pages
+    :return: list of validated pages
+    """
+    return [PageData.from_dict(page, 'pages[{}]'.format(i)) for i, page in enumerate(pages)]
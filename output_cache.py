@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Iterable, Optional
+
+import reportlab
+
+from document import render_to_bytes
+from fonts import fonts
+from profiles import get_profile
+from themes import get_theme, theme_digest
+from utils import normalize_data
+
+# The version of the document templates. It should be changed with any change of elements or page layout
+# which changes the output, so reports rendered by the old code are not served from the cache.
+TEMPLATE_VERSION = '2'
+
+
+class OutputCache():
+    """
+    A local on-disk cache of rendered reports. Reports are keyed by a hash of the normalized page data,
+    the content of referenced images and fonts and the template version.
+    The least recently used reports are evicted when the cache is bigger than max_bytes.
+    """
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024):
+        """
+        :param directory: directory for rendered reports
+        :param max_bytes: the upper bound for the size of all stored reports
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # digests of files keyed by path, modification time and size
+        self.__file_digests = {}
+        self.__lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.__size = sum(entry.stat().st_size for entry in self.__entries())
+
+    @property
+    def hit_ratio(self):
+        """
+        :return: share of requests served from the cache
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def size(self):
+        """
+        :return: size of all stored reports in bytes
+        """
+        return self.__size
+
+    def key(self, pages: Iterable[dict], profile='default', theme='default') -> str:
+        """
+        :param pages: data about pages to prepare report
+        :param profile: an output profile or its name
+        :param theme: a theme or its name
+        :return: a stable key of the report
+        """
+        pages = normalize_data(list(pages))
+        digest = hashlib.sha256()
+        digest.update('{}:{}:{}:{}\n'.format(TEMPLATE_VERSION, reportlab.Version, get_profile(profile),
+                                              theme_digest(get_theme(theme))).encode())
+        digest.update(json.dumps(pages, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode())
+        images = sorted({image for page in pages for element in page.values() if isinstance(element, dict)
+                         for image in element.get('images', ())})
+        for path in images + sorted(fonts.fonts.values()):
+            digest.update(b'\n')
+            digest.update(self.__file_digest(path))
+        return digest.hexdigest()
+
+    def get(self, key) -> Optional[bytes]:
+        """
+        :param key: a key of the report
+        :return: the stored report or None
+        """
+        path = self.__path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # the modification time is the last use time for the eviction
+        os.utime(path)
+        return data
+
+    def put(self, key, data: bytes):
+        """
+        Stores the report and evicts the least recently used reports if the cache is too big.
+        :param key: a key of the report
+        :param data: content of the pdf document
+        """
+        path = self.__path(key)
+        # a temporary file is renamed, so concurrent readers never get a partial report
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        with self.__lock:
+            if os.path.exists(path):
+                self.__size -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+            self.__size += len(data)
+            if self.__size > self.max_bytes:
+                self.__evict()
+
+    def render(self, pages: Iterable[dict], profile='default', theme='default') -> bytes:
+        """
+        :param pages: data about pages to prepare report
+        :param profile: an output profile or its name
+        :param theme: a theme or its name
+        :return: the stored report or a newly rendered one
+        """
+        pages = list(pages)
+        key = self.key(pages, profile, theme)
+        data = self.get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = render_to_bytes(pages, profile=profile, theme=theme)
+        self.put(key, data)
+        return data
+
+    def clear(self):
+        """
+        Removes all stored reports and resets counters.
+        """
+        with self.__lock:
+            for entry in self.__entries():
+                os.remove(entry.path)
+            self.__size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __evict(self):
+        entries = sorted(self.__entries(), key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in entries:
+            if self.__size <= self.max_bytes:
+                break
+            self.__size -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def __entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pdf')]
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + '.pdf')
+
+    def __file_digest(self, path) -> bytes:
+        stat = os.stat(path)
+        file_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        digest = self.__file_digests.get(file_key)
+        if digest is None:
+            with open(path, 'rb') as f:
+                digest = self.__file_digests[file_key] = hashlib.sha256(f.read()).digest()
+        return digest
@@ -0,0 +1,142 @@
+import hashlib
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from io import BytesIO
+from math import ceil
+from typing import Iterable, List, Optional
+
+from document import DocumentGenerator
+from fonts import fonts
+from model import PageData, load_pages
+from themes import get_theme
+
+try:
+    import pypdf
+except ImportError:  # pypdf is optional, reports are built sequentially without it
+    pypdf = None
+
+# the smallest number of pages in a group, smaller groups would spend more time on merging than on rendering
+MIN_GROUP_SIZE = 20
+
+
+def _init_worker():
+    """
+    Registers fonts at startup of a worker process. It is a module function, so it can be pickled
+    for workers started with spawn or forkserver.
+    """
+    fonts.register_all()
+
+
+def render_group(pages: List[PageData], profile='default', theme='default') -> bytes:
+    """
+    Builds a part of the report, it is called on worker processes.
+    :param pages: validated pages of the part
+    :param profile: an output profile or its name
+    :param theme: a theme or its name
+    :return: content of the partial pdf document
+    """
+    buffer = BytesIO()
+    DocumentGenerator(buffer, pages, profile=profile, theme=theme).build()
+    return buffer.getvalue()
+
+
+def split_groups(pages: List[PageData], group_count, min_group_size=MIN_GROUP_SIZE) -> List[List[PageData]]:
+    """
+    :param pages: validated pages of the report
+    :param group_count: the desired number of groups
+    :param min_group_size: the smallest number of pages in a group
+    :return: consecutive groups of pages
+    """
+    group_size = max(ceil(len(pages) / max(group_count, 1)), min_group_size)
+    return [pages[start:start + group_size] for start in range(0, len(pages), group_size)]
+
+
+def merge_parts(parts: Iterable[bytes], output_filename):
+    """
+    Concatenates partial documents in order. Images which are used by several parts are written once.
+    :param parts: contents of partial pdf documents
+    :param output_filename: a file name or a writable binary file-like object
+    """
+    writer = pypdf.PdfWriter()
+    images = {}
+    for part in parts:
+        reader = pypdf.PdfReader(BytesIO(part))
+        _share_images(reader, images)
+        writer.append(reader)
+    writer.write(output_filename)
+
+
+def _share_images(reader, images: dict):
+    """
+    Replaces references to images which were merged with earlier parts by references to the merged images.
+    pypdf copies the merged images only once, because it keeps the objects copied from every part.
+    :param reader: a reader of the next part
+    :param images: references to merged images by digests of their data
+    """
+    replaced = {}
+    for page in reader.pages:
+        _share_xobjects(page.get('/Resources'), images, replaced)
+
+
+def _share_xobjects(resources, images: dict, replaced: dict):
+    """
+    :param resources: a resource dictionary of a page or a form
+    :param images: references to merged images by digests of their data
+    :param replaced: references to use instead of the part objects by their numbers
+    """
+    if resources is None:
+        return
+    xobjects = resources.get_object().get('/XObject')
+    if xobjects is None:
+        return
+    xobjects = xobjects.get_object()
+    for name, reference in list(xobjects.items()):
+        if not isinstance(reference, pypdf.generic.IndirectObject):
+            continue
+        if reference.idnum in replaced:
+            xobjects[name] = replaced[reference.idnum]
+            continue
+        replaced[reference.idnum] = reference
+        xobject = reference.get_object()
+        subtype = xobject.get('/Subtype')
+        if subtype == '/Image':
+            digest = hashlib.sha1(xobject._data).digest()
+            replaced[reference.idnum] = xobjects[name] = images.setdefault(digest, reference)
+        elif subtype == '/Form':
+            # forms of reusable pages have own resources
+            _share_xobjects(xobject.get('/Resources'), images, replaced)
+
+
+def render_parallel(output_filename, pages: Iterable[dict], max_workers=None, executor: Optional[Executor] = None,
+                    min_group_size=MIN_GROUP_SIZE, profile='default', theme='default'):
+    """
+    Builds one report on worker processes. Pages are split into consecutive groups, each group is
+    laid out and rendered into a partial document by a worker, and the parts are merged in order.
+    Every part embeds subsets of the fonts used by its pages, images are shared by all parts.
+    The report is built sequentially if pypdf is not installed or there is only one group.
+    :param output_filename: a file name or a writable binary file-like object
+    :param pages: data about pages to prepare report, validated PageData or dictionaries
+    :param max_workers: number of worker processes, the number of CPUs by default
+    :param executor: a process pool to use instead of a new one, its workers can register fonts at startup
+    with parallel._init_worker
+    :param min_group_size: the smallest number of pages in a group
+    :param profile: an output profile or its name
+    :param theme: a theme or its name
+    """
+    pages = load_pages(pages)
+    # workers get the compiled theme, so themes registered in this process can be used
+    theme = get_theme(theme)
+    max_workers = max_workers or os.cpu_count() or 1
+    # a few groups per worker even out groups with slow pages
+    groups = split_groups(pages, max_workers * 4, min_group_size)
+    if pypdf is None or len(groups) < 2:
+        DocumentGenerator(output_filename, pages, profile=profile, theme=theme).build()
+        return
+
+    if executor is not None:
+        merge_parts(executor.map(render_group, groups, [profile] * len(groups), [theme] * len(groups)),
+                    output_filename)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        merge_parts(executor.map(render_group, groups, [profile] * len(groups), [theme] * len(groups)),
+                    output_filename)
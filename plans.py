@@ -0,0 +1,95 @@
+import threading
+
+from themes import ModeColors, Theme
+from utils import PageMode, stylesheets
+
+# Attributes of content elements which are not taken from the page data
+INTERNAL_ATTRIBUTES = frozenset({'mode', 'width', 'theme', 'styles', 'colors'})
+
+
+class ElementPlan():
+    """
+    Setup of a content element class for a page mode and a theme, which is shared by all its elements:
+    the stylesheet, the colors and the attributes which can be set from the element data.
+    """
+    __slots__ = ('element_class', 'mode', 'theme', 'colors', 'fields')
+
+    def __init__(self, element_class, mode: PageMode, theme: Theme):
+        """
+        :param element_class: a content element class
+        :param mode: page mode
+        :param theme: theme of the document
+        """
+        self.element_class = element_class
+        self.mode = mode
+        self.theme = theme
+        self.colors: ModeColors = theme.colors(mode)
+        self.fields = element_fields(element_class)
+
+    @property
+    def styles(self):
+        """
+        The stylesheet is taken from the registry on each access, so plans get new stylesheets
+        after stylesheets.invalidate().
+        """
+        return stylesheets.get(self.mode, self.theme)
+
+
+class ElementPlanCache():
+    """
+    This class keeps compiled plans of content elements. Elements of repeated pages with the same classes,
+    mode and theme take their setup from one plan instead of resolving it again.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.__plans = {}
+        self.__lock = threading.Lock()
+
+    def get(self, element_class, mode: PageMode, theme: Theme) -> ElementPlan:
+        """
+        :param element_class: a content element class
+        :param mode: page mode
+        :param theme: theme of the document
+        :return: the plan of the element class for the mode and the theme
+        """
+        key = (element_class, mode, theme)
+        plan = self.__plans.get(key)
+        if plan is not None:
+            self.hits += 1
+            return plan
+        with self.__lock:
+            plan = self.__plans.get(key)
+            if plan is None:
+                self.misses += 1
+                plan = self.__plans[key] = ElementPlan(element_class, mode, theme)
+        return plan
+
+    def clear(self):
+        """
+        Drops all plans, e.g. after element classes are registered again.
+        """
+        with self.__lock:
+            self.__plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_fields_cache = {}
+
+
+def element_fields(element_class) -> frozenset:
+    """
+    :param element_class: a content element class
+    :return: names of attributes which can be set from the element data
+    """
+    fields = _fields_cache.get(element_class)
+    if fields is None:
+        names = set()
+        for cls in element_class.__mro__:
+            names.update(getattr(cls, '__slots__', ()))
+        fields = _fields_cache[element_class] = frozenset(names - INTERNAL_ATTRIBUTES)
+    return fields
+
+
+element_plans = ElementPlanCache()
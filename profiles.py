@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple, Optional, Union
+
+
+class OutputProfile(NamedTuple):
+    """
+    Settings which trade the build time for the size of the pdf document.
+    """
+    name: str
+    # compression of page content streams
+    page_compression: bool
+    # resolution of images for their size on the page, images are kept in the original resolution if it is None
+    image_dpi: Optional[int] = None
+    # JPEG quality of downsampled images
+    image_quality: int = 85
+
+
+# Fonts are always embedded as subsets and an image used by several pages is embedded once in all profiles
+PROFILES = {
+    'fast': OutputProfile('fast', page_compression=False),
+    'default': OutputProfile('default', page_compression=True),
+    'small': OutputProfile('small', page_compression=True, image_dpi=150, image_quality=75),
+}
+
+_current_profile: ContextVar[OutputProfile] = ContextVar('output_profile', default=PROFILES['default'])
+
+
+def get_profile(profile: Union[str, OutputProfile]) -> OutputProfile:
+    """
+    :param profile: a name of a profile from PROFILES or a profile
+    :return: the output profile
+    """
+    if isinstance(profile, OutputProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError('unknown output profile {!r}, expected one of {}'.format(profile, ', '.join(PROFILES)))
+
+
+def current_profile() -> OutputProfile:
+    """
+    :return: the profile of the document being built in the current thread
+    """
+    return _current_profile.get()
+
+
+@contextmanager
+def use_profile(profile: OutputProfile):
+    """
+    Makes the profile current for content elements created during the block.
+    """
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
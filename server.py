@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Optional
+
+from async_render import AsyncRenderer, RendererBusy
+from loader import load_document
+from profiles import get_profile
+from themes import get_theme, themes
+
+# the longest request line, a request contains data about all pages of a report
+MAX_LINE = 64 * 1024 * 1024
+
+LINE_TOO_LONG = {'ok': False, 'error': 'line too long'}
+
+
+class RenderServer():
+    """
+    A long-lived render service. Fonts, stylesheets and caches stay warm in its worker processes,
+    so a request pays only for the layout of its report.
+    Requests and responses are JSON lines, over a Unix domain socket or stdin and stdout:
+    {"id": 1, "pages": [...], "output_filename": "report.pdf", "profile": "small", "theme": "acme"} builds a report
+    in the format of data.data_pages, the pdf is returned as base64 in "pdf" if output_filename is missing.
+    {"id": 2, "command": "health"} reports the state and the queue depth,
+    {"id": 3, "command": "shutdown"} finishes accepted requests and stops the server.
+    """
+    def __init__(self, workers=None, max_jobs_per_worker=100, max_queue=100):
+        """
+        :param workers: number of worker processes, the number of CPUs by default
+        :param max_jobs_per_worker: a worker is recycled after this number of reports to bound its memory
+        :param max_queue: number of requests waiting for a worker, other requests are rejected as busy
+        """
+        self.renderer = AsyncRenderer(workers, max_queue, use_processes=True, max_tasks_per_child=max_jobs_per_worker)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.completed = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.draining = False
+        self.__tasks = set()
+        self.__draining: Optional[asyncio.Event] = None
+        self.__stopped: Optional[asyncio.Event] = None
+        self.__server: Optional[asyncio.AbstractServer] = None
+
+    def health(self) -> dict:
+        """
+        :return: state of the server and its queue
+        """
+        return {'status': 'draining' if self.draining else 'serving',
+                'workers': self.renderer.max_concurrency,
+                'max_jobs_per_worker': self.max_jobs_per_worker,
+                'running': self.renderer.running,
+                'queue_depth': self.renderer.queue_depth,
+                'completed': self.completed,
+                'failed': self.failed,
+                'uptime': time.monotonic() - self.started}
+
+    async def handle(self, request) -> dict:
+        """
+        :param request: a parsed request
+        :return: the response
+        """
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'a JSON object is expected'}
+        response = {'id': request.get('id')}
+        command = request.get('command', 'render')
+        if command == 'health':
+            return {**response, 'ok': True, **self.health()}
+        if command == 'shutdown':
+            self.drain()
+            return {**response, 'ok': True, **self.health()}
+        if command != 'render':
+            return {**response, 'ok': False, 'error': 'unknown command {!r}'.format(command)}
+        if self.draining:
+            return {**response, 'ok': False, 'error': 'the server is shutting down'}
+
+        start = time.perf_counter()
+        try:
+            pages = load_document(request)
+            profile = get_profile(request.get('profile', 'default'))
+            # themes are passed to workers as compiled tables
+            theme = get_theme(request.get('theme', 'default'))
+            data = await self.renderer.render(pages, profile=profile, theme=theme)
+            output_filename = request.get('output_filename')
+            if output_filename is None:
+                response['pdf'] = base64.b64encode(data).decode('ascii')
+            else:
+                await asyncio.get_running_loop().run_in_executor(None, _write, output_filename, data)
+                response['output_filename'] = output_filename
+        except RendererBusy as e:
+            self.failed += 1
+            return {**response, 'ok': False, 'busy': True, 'error': str(e)}
+        except Exception as e:
+            self.failed += 1
+            return {**response, 'ok': False, 'error': '{}: {}'.format(type(e).__name__, e)}
+        self.completed += 1
+        return {**response, 'ok': True, 'size': len(data), 'duration': time.perf_counter() - start}
+
+    def drain(self):
+        """
+        Stops accepting requests. The server stops when all accepted requests are finished.
+        """
+        if self.draining:
+            return
+        self.draining = True
+        self.__draining.set()
+        if self.__server is not None:
+            self.__server.close()
+        asyncio.get_running_loop().create_task(self.__finish())
+
+    async def __finish(self):
+        while self.__tasks:
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(None, self.renderer.shutdown)
+        self.__stopped.set()
+
+    async def __read_line(self, read) -> Optional[bytes]:
+        """
+        :param read: a coroutine which reads the next request line
+        :return: the next line, or an empty line at the end of input or when the server drains.
+        It is None if the line is longer than MAX_LINE.
+        """
+        line = asyncio.ensure_future(read)
+        draining = asyncio.ensure_future(self.__draining.wait())
+        await asyncio.wait({line, draining}, return_when=asyncio.FIRST_COMPLETED)
+        draining.cancel()
+        if not line.done():
+            line.cancel()
+            return b''
+        return line.result()
+
+    def __dispatch(self, line: bytes, respond, tasks: set):
+        """
+        Handles a request line in a separate task, so responses are sent in order of completion.
+        :param line: a request line
+        :param respond: a function which sends a response
+        :param tasks: tasks of the connection
+        """
+        if len(line) > MAX_LINE:
+            respond(LINE_TOO_LONG)
+            return
+
+        async def process():
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {'ok': False, 'error': 'invalid JSON: {}'.format(e)}
+            else:
+                response = await self.handle(request)
+            respond(response)
+
+        task = asyncio.get_running_loop().create_task(process())
+        for task_set in (self.__tasks, tasks):
+            task_set.add(task)
+            task.add_done_callback(task_set.discard)
+
+    async def __serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        def respond(response):
+            if not writer.is_closing():
+                writer.write(json.dumps(response).encode() + b'\n')
+
+        tasks = set()
+        try:
+            while True:
+                line = await self.__read_line(_read_request(reader))
+                if line is None:
+                    respond(LINE_TOO_LONG)
+                    continue
+                if not line:
+                    break
+                if line.strip():
+                    self.__dispatch(line, respond, tasks)
+            # responses to accepted requests are still sent while the server drains
+            while tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve_unix(self, path):
+        """
+        Serves requests of clients connected to the Unix domain socket until the server is drained.
+        :param path: path of the socket
+        """
+        self.__draining = asyncio.Event()
+        self.__stopped = asyncio.Event()
+        self.__install_signal_handlers()
+        self.__server = await asyncio.start_unix_server(self.__serve_connection, path, limit=MAX_LINE)
+        try:
+            await self.__stopped.wait()
+        finally:
+            self.__server.close()
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def serve_stdio(self):
+        """
+        Serves requests from stdin and writes responses to stdout until stdin is closed or the server is drained.
+        """
+        self.__draining = asyncio.Event()
+        self.__stopped = asyncio.Event()
+        self.__install_signal_handlers()
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+
+        def read():
+            # stdin can be a file or a terminal, so it is read by a thread which does not keep the process alive
+            try:
+                for line in sys.stdin.buffer:
+                    loop.call_soon_threadsafe(lines.put_nowait, line)
+                loop.call_soon_threadsafe(lines.put_nowait, b'')
+            except RuntimeError:  # the loop is closed
+                pass
+
+        def respond(response):
+            sys.stdout.write(json.dumps(response) + '\n')
+            sys.stdout.flush()
+
+        threading.Thread(target=read, name='stdin', daemon=True).start()
+        tasks = set()
+        while True:
+            line = await self.__read_line(lines.get())
+            if not line:
+                break
+            if line.strip():
+                self.__dispatch(line, respond, tasks)
+        self.drain()
+        await self.__stopped.wait()
+
+    def __install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.drain)
+            except (NotImplementedError, RuntimeError):  # not supported on Windows or outside of the main thread
+                pass
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """
+    :return: the next line, an empty line at the end of input or None if the line is longer than the limit
+    of the reader. The rest of a long line is skipped, so the next request is read from the next line.
+    """
+    try:
+        return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError:
+        pass
+    while True:
+        try:
+            await reader.readuntil(b'\n')
+            return None
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError:
+            return None
+
+
+def _write(output_filename, data: bytes):
+    with open(output_filename, 'wb') as f:
+        f.write(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve pdf report requests as JSON lines.')
+    parser.add_argument('--socket', default=None, help='path of a Unix domain socket, stdin and stdout by default')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--max-jobs-per-worker', type=int, default=100,
+                        help='number of reports after which a worker process is replaced')
+    parser.add_argument('--max-queue', type=int, default=100, help='number of requests waiting for a worker')
+    parser.add_argument('--themes', default=None, help='a JSON file with themes, see themes.py')
+    args = parser.parse_args(argv)
+
+    if args.themes is not None:
+        themes.load(args.themes)
+    server = RenderServer(args.workers, args.max_jobs_per_worker, args.max_queue)
+    if args.socket is None:
+        asyncio.run(server.serve_stdio())
+    else:
+        asyncio.run(server.serve_unix(args.socket))
+    print(json.dumps(server.health()), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
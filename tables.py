@@ -0,0 +1,119 @@
+from math import ceil
+from typing import Callable, List, Sequence
+
+from reportlab.platypus import Flowable, Paragraph, Table, TableStyle
+from reportlab.lib.styles import ParagraphStyle
+
+from metrics import string_width
+
+# default paddings of reportlab table cells
+_H_PADDING = 6 + 6
+_V_PADDING = 3 + 3
+
+
+def is_plain_text(text, style: ParagraphStyle, width) -> bool:
+    """
+    :param text: text of a cell
+    :param style: the paragraph style of the cell
+    :param width: width of the column
+    :return: True if the text has no markup and fits on one line, so it can be drawn as a plain string
+    """
+    return ('<' not in text and '&' not in text and '\n' not in text
+            and string_width(text, style.fontName, style.fontSize) <= width - _H_PADDING)
+
+
+def make_cells(row: Sequence[str], style: ParagraphStyle, col_widths: Sequence[float]) -> list:
+    """
+    :param row: texts of the cells
+    :param style: the paragraph style of the cells
+    :param col_widths: widths of the columns
+    :return: plain strings for short cells and paragraphs for other ones
+    """
+    return [text if is_plain_text(text, style, width) else Paragraph(text, style)
+            for text, width in zip(row, col_widths)]
+
+
+class StreamingTable(Flowable):
+    """
+    A table for many rows which can be split across pages. Only rows which can fit on the current page
+    are turned into cell flowables and measured, so the layout time grows linearly with the number of rows.
+    The last head row, e.g. column headers, is repeated on every continuation page.
+    """
+    def __init__(self, head: List[list], rows: Sequence, make_row: Callable[[Sequence], list],
+                 col_widths: Sequence[float], style: Callable[[int, int], list], row_style: ParagraphStyle,
+                 repeat_rows=1, start=0, made_rows=None):
+        """
+        :param head: rows of cell flowables drawn above the rows, e.g. a title and column headers
+        :param rows: data of the rows
+        :param make_row: a function which creates cell flowables of a row from its data
+        :param col_widths: fixed widths of the columns
+        :param style: a function which returns table style commands for the number of head rows
+        and the number of rows in a part of the table
+        :param row_style: the paragraph style of rows, it is used to estimate the smallest row height
+        :param repeat_rows: number of the last head rows which are repeated on continuation pages
+        :param start: index of the first row of this part
+        :param made_rows: cell flowables of rows from start which were already created
+        """
+        super().__init__()
+        self.head = head
+        self.rows = rows
+        self.make_row = make_row
+        self.col_widths = col_widths
+        self.style = style
+        self.row_style = row_style
+        self.repeat_rows = repeat_rows
+        self.start = start
+        self.made_rows = made_rows if made_rows is not None else []
+        # no row is lower than one line of text with paddings
+        self.min_row_height = row_style.leading + _V_PADDING
+        self.table = None
+
+    def __make_rows(self, count):
+        """
+        :return: cell flowables of the next count rows, which are created on the first use
+        """
+        stop = min(self.start + count, len(self.rows))
+        for i in range(self.start + len(self.made_rows), stop):
+            self.made_rows.append(self.make_row(self.rows[i]))
+        return self.made_rows[:stop - self.start]
+
+    def __get_table(self, availWidth, availHeight) -> Table:
+        """
+        :return: a table with the head and the rows which can fit in the available height
+        """
+        remaining = len(self.rows) - self.start
+        count = min(ceil(availHeight / self.min_row_height) + 1, remaining)
+        while True:
+            rows = self.__make_rows(count)
+            table = Table(self.head + rows, colWidths=self.col_widths, repeatRows=len(self.head),
+                          style=TableStyle(self.style(len(self.head), len(rows))))
+            _, height = table.wrap(availWidth, availHeight)
+            # the estimate is usually enough, more rows are taken only if rows are lower than expected
+            if count >= remaining or height > availHeight:
+                return table
+            count = min(count * 2, remaining)
+
+    def wrap(self, availWidth, availHeight):
+        self.table = self.__get_table(availWidth, availHeight)
+        self.width, self.height = self.table.wrap(availWidth, availHeight)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        if self.table is None:
+            self.wrap(availWidth, availHeight)
+        parts = self.table.split(availWidth, availHeight)
+        if len(parts) < 2:
+            return parts
+        first = parts[0]
+        count = len(first._cellvalues) - len(self.head)
+        if count <= 0:
+            return []
+        if self.start + count >= len(self.rows):
+            return [first]
+        rest = StreamingTable(self.head[-self.repeat_rows:] if self.repeat_rows else [], self.rows, self.make_row,
+                              self.col_widths, self.style, self.row_style, self.repeat_rows, self.start + count,
+                              self.made_rows[count:])
+        return [first, rest]
+
+    def draw(self):
+        self.table.drawOn(self.canv, 0, 0)
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# the modules of the generator are in the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from reportlab import rl_config  # noqa: E402
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-golden', action='store_true', default=False,
+                     help='write golden outputs of the current tree instead of comparing with them')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'perf: time and memory budgets, deselect with -m "not perf"')
+
+
+@pytest.fixture(autouse=True)
+def invariant():
+    """
+    Documents are built without dates and random ids, so the same input gives the same bytes.
+    """
+    previous = rl_config.invariant
+    rl_config.invariant = 1
+    yield
+    rl_config.invariant = previous
+
+
+@pytest.fixture
+def update_golden(request) -> bool:
+    return request.config.getoption('--update-golden')
@@ -0,0 +1,76 @@
+"""
+Summaries of pdf documents which are compared with golden outputs.
+A summary keeps the text and checksums of the content stream and resources of every page,
+so a change of the layout shows which page and what changed.
+"""
+import hashlib
+import json
+import os
+from io import BytesIO
+
+import pytest
+
+pypdf = pytest.importorskip('pypdf')
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+
+def summarize(data: bytes, with_text=True) -> dict:
+    """
+    :param data: content of a pdf document
+    :param with_text: keep the text of pages, otherwise only its checksum is kept
+    :return: page count and text, content and resource checksums of each page
+    """
+    reader = pypdf.PdfReader(BytesIO(data))
+    pages = []
+    for page in reader.pages:
+        text = page.extract_text()
+        resources = page.get('/Resources', {})
+        fonts = sorted(str(font.get_object().get('/BaseFont')).split('+')[-1]
+                       for font in resources.get('/Font', {}).values())
+        summary = {'text_sha1': hashlib.sha1(text.encode()).hexdigest(),
+                   'content_sha1': hashlib.sha1(page.get_contents().get_data()).hexdigest(),
+                   'fonts': fonts,
+                   'xobjects': len(resources.get('/XObject', {}))}
+        if with_text:
+            summary['text'] = text
+        pages.append(summary)
+    return {'page_count': len(reader.pages), 'pages': pages}
+
+
+def texts(data: bytes) -> list:
+    """
+    :return: text of each page of a pdf document
+    """
+    return [page.extract_text() for page in pypdf.PdfReader(BytesIO(data)).pages]
+
+
+def check_golden(name, data: bytes, update=False, with_text=True):
+    """
+    Compares a document with its golden summary in tests/golden or stores the summary if update is True.
+    :param name: name of the golden file without the extension
+    :param data: content of the pdf document
+    :param update: store the summary of the document as the new golden output
+    :param with_text: keep the text of pages in the golden file
+    """
+    path = os.path.join(GOLDEN_DIR, name + '.json')
+    actual = summarize(data, with_text)
+    if update:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(actual, f, indent=1, ensure_ascii=False)
+            f.write('\n')
+        return
+    if not os.path.exists(path):
+        pytest.fail('{} is missing, run pytest --update-golden to create it'.format(path))
+    with open(path, encoding='utf-8') as f:
+        expected = json.load(f)
+
+    assert actual['page_count'] == expected['page_count']
+    for number, (page, golden) in enumerate(zip(actual['pages'], expected['pages']), 1):
+        if with_text:
+            assert page['text'] == golden['text'], 'text of page {} is changed'.format(number)
+        assert page['text_sha1'] == golden['text_sha1'], 'text of page {} is changed'.format(number)
+        assert page['fonts'] == golden['fonts'], 'fonts of page {} are changed'.format(number)
+        assert page['xobjects'] == golden['xobjects'], 'images and forms of page {} are changed'.format(number)
+        assert page['content_sha1'] == golden['content_sha1'], 'drawing of page {} is changed'.format(number)
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+
+import async_render
+from async_render import AsyncRenderer, RendererBusy, generate_async, shutdown_default_renderer
+from data import data_pages
+from pdfcheck import texts
+
+
+async def wait_for(condition):
+    while not condition():
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def blocked_builds(monkeypatch) -> threading.Event:
+    """
+    Builds of renderers wait until the event is set.
+    """
+    release = threading.Event()
+
+    def render_to_bytes(*args):
+        release.wait(10)
+        return b'%PDF'
+
+    monkeypatch.setattr(async_render, 'render_to_bytes', render_to_bytes)
+    yield release
+    release.set()
+
+
+def test_full_queue_is_rejected_and_cancelled_calls_free_their_slots(blocked_builds):
+    async def run():
+        async with AsyncRenderer(1, max_queue=1) as renderer:
+            running = asyncio.ensure_future(renderer.render([]))
+            await wait_for(lambda: renderer.running == 1)
+            waiting = asyncio.ensure_future(renderer.render([]))
+            await wait_for(lambda: renderer.queue_depth == 1)
+            with pytest.raises(RendererBusy):
+                await renderer.render([])
+
+            # a cancelled waiting call leaves the queue
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+            assert renderer.queue_depth == 0
+            # a cancelled running call keeps its slot until the build is finished
+            running.cancel()
+            await asyncio.gather(running, return_exceptions=True)
+            assert renderer.running == 1
+            blocked_builds.set()
+            assert await asyncio.wait_for(renderer.render([]), 10) == b'%PDF'
+            assert (renderer.running, renderer.queue_depth) == (0, 0)
+
+    asyncio.run(run())
+
+
+def test_default_renderer_can_be_shut_down():
+    try:
+        first = asyncio.run(generate_async(data_pages))
+        shutdown_default_renderer()
+        # a new renderer is created for the new event loop
+        assert texts(asyncio.run(generate_async(data_pages))) == texts(first)
+    finally:
+        shutdown_default_renderer()
@@ -0,0 +1,227 @@
+import copy
+import json
+import os
+import subprocess
+import sys
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from benchmark import make_pages
+from data import data_pages
+from document import DocumentGenerator
+from elements import FooterTestsElement
+from instrumentation import BuildStats
+from model import PageDataError, load_pages
+from pdfcheck import texts
+from utils import get_page_number_as_str
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build(pages, **options) -> bytes:
+    buffer = BytesIO()
+    DocumentGenerator(buffer, pages, **options).build()
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('number, expected', [(0, '00'), (1, '01'), (9, '09'), (10, '10'), (99, '99'),
+                                              (100, '100'), (12345, '12345')])
+def test_page_number_as_str(number, expected):
+    assert get_page_number_as_str(number) == expected
+
+
+def test_two_digit_page_numbers_are_drawn():
+    pages = make_pages(12)
+    page_texts = texts(build(pages))
+    assert len(page_texts) == 12
+    assert '12' in page_texts[11]
+
+
+def test_long_text_continues_on_next_pages():
+    pages = make_pages(1, text_length=20000)
+    page_texts = texts(build(pages))
+    assert len(page_texts) > 1
+    # the footer stays on the last sheet of the page
+    assert 'FIG 1' not in page_texts[0]
+    assert 'FIG 1' in page_texts[-1]
+
+
+@pytest.mark.parametrize('rows', [0, 1, FooterTestsElement.STREAMING_ROWS, FooterTestsElement.STREAMING_ROWS + 1,
+                                  300])
+def test_test_tables(rows):
+    pages = make_pages(2, table_rows=rows)
+    page_texts = texts(build(pages))
+    text = ''.join(page_texts)
+    assert 'TABLE III' in text
+    if rows:
+        assert 'Analysis {}'.format(rows - 1) in text
+    if rows == 300:
+        # the column headers are repeated on continuation pages
+        assert len(page_texts) > 3
+        assert all('TABLE III' in page_text for page_text in page_texts[1:])
+
+
+def test_footer_without_images():
+    assert len(texts(build(make_pages(1, image_count=0)))) == 1
+
+
+def test_empty_document():
+    assert build([]).startswith(b'%PDF')
+
+
+@pytest.mark.parametrize('change, message', [
+    (lambda page: page.pop('header'), 'header is missing'),
+    (lambda page: page.update(page_number=-1), 'page_number'),
+    (lambda page: page.update(page_number=True), 'page_number'),
+    (lambda page: page.update(mode='sepia'), 'unknown mode'),
+    (lambda page: page['body'].update(class_name='Nope'), 'unknown class_name'),
+    (lambda page: page['body'].update(class_name='FooterElement'), 'cannot be used as BodyElement'),
+    (lambda page: page['body'].update(styles={}), 'unknown attributes styles'),
+    (lambda page: page.update(extra=1), 'unknown keys extra'),
+    (lambda page: page['body'].update(text=5), r'body\.text: a string is expected, got int'),
+    (lambda page: page['header'].update(breadcrumbs=None), r'header\.breadcrumbs: a list of strings'),
+    (lambda page: page['header'].update(breadcrumbs=['a', 1]), 'an item of int'),
+    (lambda page: page['category'].update(h_padding='6'), 'a number is expected'),
+])
+def test_invalid_page_data(change, message):
+    pages = copy.deepcopy(data_pages)
+    change(pages[1])
+    with pytest.raises(PageDataError, match=message):
+        load_pages(pages)
+
+
+def test_malformed_batch_jobs_fail_alone():
+    from batch import render_batch, read_jobs
+    source = BytesIO(b'{"pages": []}\n[1, 2]\n{"output_filename": "x.pdf"}\n')
+    results = list(render_batch(read_jobs(source, 'jsonl'), max_workers=1))
+    assert [(result.output_filename, result.success) for result in results] == \
+        [('job 1', False), ('job 2', False), ('x.pdf', False)]
+    assert [result.error for result in results] == ['job 1: output_filename is missing',
+                                                    'job 2: an object is expected, got list',
+                                                    'job 3: pages are missing']
+
+
+class _KillWorker():
+    """
+    Pages which kill the worker process when they are unpickled.
+    """
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+def test_batch_continues_after_a_worker_dies(tmp_path):
+    from batch import render_batch
+    jobs = [(str(tmp_path / 'killed.pdf'), [_KillWorker()]),
+            (str(tmp_path / 'unpicklable.pdf'), [lambda: None])] + \
+        [(str(tmp_path / '{}.pdf'.format(number)), make_pages(1)) for number in range(3)]
+    results = list(render_batch(jobs, max_workers=1))
+    by_filename = {result.output_filename: result for result in results}
+    assert len(results) == len(jobs)
+    assert 'BrokenProcessPool' in by_filename[str(tmp_path / 'killed.pdf')].error
+    assert not by_filename[str(tmp_path / 'unpicklable.pdf')].success
+    # the last job is submitted to a new pool
+    assert by_filename[str(tmp_path / '2.pdf')].success
+    assert len(texts((tmp_path / '2.pdf').read_bytes())) == 1
+
+
+_MARKUP_FONT_BUILD = '''
+import copy, json
+from io import BytesIO
+from reportlab.pdfbase import pdfmetrics
+from data import data_pages
+from document import DocumentGenerator
+pages = copy.deepcopy(data_pages)
+pages[0]['body']['text'] = '<font face="NeueMontrealBold">Bold</font> and plain text'
+buffer = BytesIO()
+DocumentGenerator(buffer, pages).build()
+print(json.dumps(pdfmetrics.getRegisteredFontNames()))
+'''
+
+
+def test_font_used_only_in_markup():
+    pages = copy.deepcopy(data_pages)
+    pages[0]['body']['text'] = '<font face="NeueMontrealBold">Bold</font> and plain text'
+    assert 'Bold and plain text' in texts(build(pages))[0]
+    # fonts are registered lazily, a new process registers only fonts of the styles and the markup
+    result = subprocess.run([sys.executable, '-c', _MARKUP_FONT_BUILD], cwd=ROOT, capture_output=True, text=True,
+                            check=True)
+    registered = json.loads(result.stdout.strip().splitlines()[-1])
+    assert 'NeueMontrealBold' in registered
+    assert 'NeueMontrealLight' not in registered
+
+
+@pytest.mark.parametrize('text', ['Plain prose without any markup at all. ' * 20, 'x' * 500,
+                                  'Plain prose without any markup at all. ' * 2000],
+                         ids=['prose', 'one-word', 'continued'])
+def test_body_text_without_markup(text):
+    pages = copy.deepcopy(data_pages)
+    pages[0]['body']['text'] = text
+    page_text = ''.join(texts(build(pages)))
+    assert 'Plain prose' in page_text or 'xxxxxxxx' in page_text
+
+
+def test_measured_widths_are_the_same_as_of_reportlab():
+    from reportlab.pdfbase import pdfmetrics
+    from metrics import measure_many, string_width
+    strings = ['Breadcrumb', 'Ünïcödé text', '', 'x' * 300, 'smile \U0001F600']
+    expected = [pdfmetrics.stringWidth(text, 'NeueMontreal', 9.5) for text in strings]
+    assert measure_many(strings, 'NeueMontreal', 9.5) == expected
+    assert [string_width(text, 'NeueMontreal', 9.5) for text in strings] == expected
+
+
+def test_stats_of_a_build_into_a_zip_entry():
+    archive = BytesIO()
+    stats = BuildStats()
+    with zipfile.ZipFile(archive, 'w') as zip_file, zip_file.open('report.pdf', 'w') as entry:
+        DocumentGenerator(entry, make_pages(2), stats=stats).build()
+    with zipfile.ZipFile(archive) as zip_file:
+        data = zip_file.read('report.pdf')
+    assert stats.counters['bytes.default'] == len(data)
+    assert len(texts(data)) == 2
+
+
+def test_plans_take_stylesheets_built_after_invalidate():
+    from plans import element_plans
+    from themes import DEFAULT_THEME
+    from utils import PageMode, stylesheets
+    plan = element_plans.get(FooterTestsElement, PageMode.light, DEFAULT_THEME)
+    assert plan.styles is stylesheets.get(PageMode.light, DEFAULT_THEME)
+    stylesheets.invalidate()
+    assert plan.styles is stylesheets.get(PageMode.light, DEFAULT_THEME)
+
+
+@pytest.mark.parametrize('footer, message', [
+    ({'class_name': 'FooterElement', 'images': 'static/images/face.jpg'}, 'a list of strings is expected, got str'),
+    ({'class_name': 'FooterElement', 'images': ['static/images/missing.jpg']}, 'missing.jpg.* does not exist'),
+    ({'class_name': 'FooterTestsElement', 'rows': [1, 2]}, 'rows: a list of strings is expected, got int'),
+    ({'class_name': 'FooterTestsElement', 'rows': [['ok', None]]}, 'rows: a list of strings'),
+    ({'class_name': 'FooterTestsElement', 'headers': 'Test'}, r'footer\.headers'),
+])
+def test_invalid_footer_data(footer, message):
+    pages = copy.deepcopy(data_pages)
+    pages[0]['footer'] = footer
+    with pytest.raises(PageDataError, match=message):
+        load_pages(pages)
+
+
+def test_bundle_documents_of_all_shapes():
+    from bundle import read_documents
+    source = BytesIO(b'[]\n{"output_filename": "out/acme.pdf", "pages": []}\n{"title": "no pages"}\n5\n'
+                     b'{"title": "last", "pages": []}\n')
+    errors = []
+    documents = list(read_documents(source, 'jsonl', on_error=errors.append))
+    assert [document.title for document in documents] == ['Report 1', 'acme', 'last']
+    assert errors == ['no pages: pages should be a list, got NoneType',
+                      'Report 4: an object or a list of pages is expected, got int']
+
+
+def test_build_stats():
+    stats = BuildStats()
+    build(make_pages(2), stats=stats)
+    assert {'page.init', 'page.story', 'document.build'} <= stats.spans.keys()
+    assert stats.counters['pages'] == 2
+    if stats.peak_rss is not None:
+        # bytes on every platform, a build takes more than 10 MB and less than 10 GB
+        assert 10 * 1024 * 1024 < stats.peak_rss < 10 * 1024 ** 3
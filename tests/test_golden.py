@@ -0,0 +1,98 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+from benchmark import make_pages
+from bundle import BundleDocument, write_bundle
+from data import data_pages
+from document import DocumentGenerator, iter_pdf_chunks, render_to_bytes
+from fragments import PageFragmentCache
+from pdfcheck import check_golden, pypdf, texts
+from themes import compile_theme
+
+
+def build(pages, **options) -> bytes:
+    buffer = BytesIO()
+    DocumentGenerator(buffer, pages, **options).build()
+    return buffer.getvalue()
+
+
+def test_data_pages(update_golden):
+    check_golden('data_pages', build(data_pages), update_golden)
+
+
+def test_synthetic_pages(update_golden):
+    check_golden('synthetic_10', build(make_pages(10, table_rows=30)), update_golden)
+
+
+def test_synthetic_pages_without_markup(update_golden):
+    # body texts without markup are laid out by reportlab in another way, see columns.ParagraphLines
+    check_golden('synthetic_plain', build(make_pages(4, text_length=8000, markup=False)), update_golden)
+
+
+def test_small_profile(update_golden):
+    check_golden('data_pages_small', build(data_pages, profile='small'), update_golden, with_text=False)
+
+
+def test_streaming_build_is_identical():
+    pages = make_pages(10)
+    assert build(iter(pages), streaming=True) == build(pages)
+
+
+def test_builds_are_repeatable():
+    # caches of stylesheets, drawings, images and glyph widths are warm in the second build
+    assert build(data_pages) == build(data_pages)
+
+
+def test_reusable_pages_have_the_same_text():
+    pages = make_pages(6)
+    for page in pages:
+        page['reusable'] = True
+    cache = PageFragmentCache()
+    expected = texts(build(pages))
+    assert texts(build(pages, page_cache=cache)) == expected
+    assert texts(build(pages, page_cache=cache)) == expected
+    assert cache.hits > 0
+
+
+def test_parallel_build_has_the_same_pages(tmp_path):
+    from parallel import render_parallel
+    pages = make_pages(20)
+    output = tmp_path / 'parallel.pdf'
+    with ThreadPoolExecutor(2) as executor:
+        render_parallel(str(output), pages, max_workers=2, executor=executor, min_group_size=5)
+    assert texts(output.read_bytes()) == texts(build(pages))
+
+
+def test_parallel_build_on_processes(tmp_path):
+    from parallel import _init_worker, render_parallel
+    pages = make_pages(20)
+    expected = texts(build(pages))
+    output = tmp_path / 'parallel.pdf'
+    render_parallel(str(output), pages, max_workers=2, min_group_size=5)
+    assert texts(output.read_bytes()) == expected
+    # the initializer and the parts are pickled for workers started with spawn
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker) as executor:
+        render_parallel(str(output), pages, max_workers=2, executor=executor, min_group_size=5)
+    assert texts(output.read_bytes()) == expected
+
+
+def test_bundle_has_outline_entries():
+    data = BytesIO()
+    count = write_bundle(data, [BundleDocument('first', data_pages), BundleDocument('second', make_pages(3))])
+    reader = pypdf.PdfReader(BytesIO(data.getvalue()))
+    assert count == 2
+    assert [(entry.title, reader.get_destination_page_number(entry)) for entry in reader.outline] == \
+        [('first', 0), ('second', 2)]
+    assert [page.extract_text() for page in reader.pages] == texts(build(data_pages)) + texts(build(make_pages(3)))
+
+
+def test_themes_do_not_change_the_default_output():
+    expected = render_to_bytes(data_pages)
+    theme = compile_theme({'name': 'test', 'light': {'background': '#FFF8E7'}, 'dark': {'text': '#EEEEEE'}})
+    themed = render_to_bytes(data_pages, theme=theme)
+    assert themed != expected
+    assert texts(themed) == texts(expected)
+    assert render_to_bytes(data_pages) == expected
+    assert b''.join(iter_pdf_chunks(data_pages, 4096, theme=theme, profile='small')) == \
+        render_to_bytes(data_pages, theme=theme, profile='small')
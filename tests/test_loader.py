@@ -0,0 +1,47 @@
+import json
+from io import BytesIO
+
+import pytest
+
+import loader
+from loader import _iter_array, iter_documents
+
+ITEMS = [{'text': 'a, b] [c', 'quote': 'say "hi" \\ ok', 'unicode': 'Ünïcödé ✓ \U0001F600'},
+         12345678901234567890, -0.125e-3, 'plain', [], {}, [[1, [2, [3]]], {'a': {'b': None}}], True, None]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64 * 1024])
+@pytest.mark.parametrize('separators', [(',', ':'), (' ,\n\t', ' :  ')])
+def test_array_items_across_chunk_boundaries(monkeypatch, chunk_size, separators):
+    monkeypatch.setattr(loader, '_CHUNK_SIZE', chunk_size)
+    data = ('\n  ' + json.dumps(ITEMS, separators=separators, ensure_ascii=False) + ' \r\n').encode()
+    assert list(_iter_array(BytesIO(data))) == ITEMS
+
+
+@pytest.mark.parametrize('data', [b'[]', b' [ \n ] '])
+def test_empty_arrays(data):
+    assert list(_iter_array(BytesIO(data))) == []
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'', 'a JSON array is expected'),
+    (b'  \n ', 'a JSON array is expected'),
+    (b'{"pages": []}', 'a JSON array is expected'),
+    (b'[1, 2', 'unexpected end'),
+    (b'[1 2]', '"," or "]" is expected'),
+    (b'[{"a": ]', 'Expecting value'),
+])
+def test_invalid_arrays(monkeypatch, data, message):
+    monkeypatch.setattr(loader, '_CHUNK_SIZE', 2)
+    with pytest.raises(ValueError, match=message):
+        list(_iter_array(BytesIO(data)))
+
+
+def test_documents_in_both_formats():
+    documents = [{'output_filename': 'a.pdf', 'pages': []}, []]
+    array = json.dumps(documents).encode()
+    lines = b'\n'.join(json.dumps(document).encode() for document in documents) + b'\n\n'
+    assert list(iter_documents(BytesIO(array))) == documents
+    assert list(iter_documents(BytesIO(lines))) == documents
+    with pytest.raises(ValueError, match='line 2'):
+        list(iter_documents(BytesIO(b'{}\n{"a": \n'), 'jsonl'))
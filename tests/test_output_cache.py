@@ -0,0 +1,53 @@
+import os
+
+import output_cache
+from benchmark import make_pages
+from output_cache import OutputCache
+
+
+def test_least_recently_used_reports_are_evicted(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=250)
+    for key in ('a', 'b'):
+        cache.put(key, b'x' * 100)
+    for time, key in enumerate(('a', 'b'), 1):
+        os.utime(tmp_path / (key + '.pdf'), (time, time))
+    # the modification time is the last use time, so "b" is the least recently used report now
+    assert cache.get('a') == b'x' * 100
+    cache.put('c', b'x' * 100)
+    assert sorted(os.listdir(tmp_path)) == ['a.pdf', 'c.pdf']
+    assert cache.size == 200
+    assert cache.get('b') is None
+
+
+def test_put_replaces_a_report_atomically(tmp_path):
+    cache = OutputCache(str(tmp_path))
+    cache.put('a', b'x' * 100)
+    cache.put('a', b'y' * 10)
+    assert cache.get('a') == b'y' * 10
+    assert cache.size == 10
+    assert os.listdir(tmp_path) == ['a.pdf']
+    # the size of stored reports is restored by a new cache
+    assert OutputCache(str(tmp_path)).size == 10
+
+
+def test_hit_ratio(tmp_path):
+    cache = OutputCache(str(tmp_path))
+    assert cache.hit_ratio == 0.0
+    pages = make_pages(1)
+    first = cache.render(pages)
+    assert cache.render(pages) == first
+    assert (cache.hits, cache.misses, cache.hit_ratio) == (1, 1, 0.5)
+
+
+def test_version_and_profile_change_the_key(tmp_path, monkeypatch):
+    cache = OutputCache(str(tmp_path))
+    pages = make_pages(1)
+    cache.render(pages)
+    key = cache.key(pages)
+    assert cache.key(pages, profile='small') != key
+    cache.render(pages, profile='small')
+    assert cache.misses == 2
+    monkeypatch.setattr(output_cache, 'TEMPLATE_VERSION', 'test')
+    assert cache.key(pages) != key
+    cache.render(pages)
+    assert (cache.hits, cache.misses) == (0, 3)
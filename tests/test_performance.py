@@ -0,0 +1,57 @@
+"""
+Time and peak memory budgets of the build. Every build runs in a new process, so its peak RSS is not affected by
+other tests. The budgets are generous for a single core, PDFGEN_PERF_FACTOR scales the time budgets on slower machines.
+The 10,000 pages build takes a few minutes and runs only with PDFGEN_PERF_LARGE=1.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.perf
+
+TIME_FACTOR = float(os.environ.get('PDFGEN_PERF_FACTOR', '1'))
+
+_BUILD = '''
+import json, resource, sys, time
+from reportlab import rl_config
+rl_config.invariant = 1
+from benchmark import make_pages
+from document import DocumentGenerator
+page_count, output = int(sys.argv[1]), sys.argv[2]
+start = time.perf_counter()
+DocumentGenerator(output, make_pages(page_count), streaming=True).build()
+duration = time.perf_counter() - start
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'duration': duration, 'rss_mb': rss / 1024 / (1024 if sys.platform == 'darwin' else 1)}))
+'''
+
+
+def measure_build(page_count, output) -> dict:
+    """
+    :return: the build time in seconds and the peak RSS of the process in MB
+    """
+    result = subprocess.run([sys.executable, '-c', _BUILD, str(page_count), str(output)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('page_count, max_seconds, max_rss_mb', [
+    (10, 10, 250),
+    (1000, 60, 400),
+    pytest.param(10000, 600, 500, marks=pytest.mark.skipif(not os.environ.get('PDFGEN_PERF_LARGE'),
+                                                           reason='set PDFGEN_PERF_LARGE=1 to build 10,000 pages')),
+])
+def test_build_budget(tmp_path, page_count, max_seconds, max_rss_mb):
+    pypdf = pytest.importorskip('pypdf')
+    output = tmp_path / 'report.pdf'
+    result = measure_build(page_count, output)
+    print('{} pages: {:.2f}s, {:.0f} MB'.format(page_count, result['duration'], result['rss_mb']))
+    assert len(pypdf.PdfReader(str(output)).pages) >= page_count
+    assert result['duration'] <= max_seconds * TIME_FACTOR
+    assert result['rss_mb'] <= max_rss_mb
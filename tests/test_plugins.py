@@ -0,0 +1,79 @@
+import copy
+import sys
+from importlib.metadata import EntryPoint
+
+import pytest
+
+import elements
+from data import data_pages
+from document import render_to_bytes
+from model import load_pages
+from pdfcheck import texts
+
+PLUGIN = '''
+from elements import FooterElement, register_element
+
+
+class AcmeFooterElement(FooterElement):
+    __slots__ = ('note',)
+
+    def __init__(self, data, width, mode):
+        self.note = ''
+        super().__init__(data, width, mode)
+
+    def get_content(self):
+        table = super().get_content()
+        table._cellvalues[0][0] = self.note
+        return table
+
+
+@register_element
+class AcmeRegisteredFooterElement(AcmeFooterElement):
+    __slots__ = ()
+'''
+
+
+@pytest.fixture
+def plugins(tmp_path, monkeypatch) -> list:
+    """
+    :return: entry points of installed packages, a test adds its entry points to the list
+    """
+    (tmp_path / 'acme_plugin.py').write_text(PLUGIN)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(elements, 'ELEMENT_CLASSES', dict(elements.ELEMENT_CLASSES))
+    monkeypatch.setattr(elements, '_plugins_loaded', False)
+    installed = []
+    monkeypatch.setattr(elements, 'entry_points',
+                        lambda group: [entry_point for entry_point in installed if entry_point.group == group])
+    yield installed
+    # the module registers its classes again when it is imported by the next test
+    sys.modules.pop('acme_plugin', None)
+
+
+def test_plugins_are_loaded_on_the_first_unknown_class_name(plugins):
+    plugins.append(EntryPoint('acme', 'acme_plugin:AcmeFooterElement', elements.ELEMENT_PLUGINS_GROUP))
+    plugins.append(EntryPoint('other', 'acme_plugin:Missing', 'other.group'))
+    assert elements.get_element_class('AcmeFooterElement').__module__ == 'acme_plugin'
+    # the module of the entry point registers its other classes too
+    assert 'AcmeRegisteredFooterElement' in elements.ELEMENT_CLASSES
+
+    pages = copy.deepcopy(data_pages)
+    pages[0]['footer'] = {'class_name': 'AcmeFooterElement', 'note': 'ACME NOTE', 'images': []}
+    load_pages(pages)
+    assert 'ACME NOTE' in texts(render_to_bytes(pages))[0]
+
+
+def test_module_entry_points_register_their_classes(plugins):
+    plugins.append(EntryPoint('acme', 'acme_plugin', elements.ELEMENT_PLUGINS_GROUP))
+    assert elements.load_element_plugins() == ['acme']
+    assert 'AcmeRegisteredFooterElement' in elements.ELEMENT_CLASSES
+    assert 'AcmeFooterElement' not in elements.ELEMENT_CLASSES
+
+
+def test_broken_plugins_are_reported(plugins):
+    plugins.append(EntryPoint('broken', 'acme_plugin:Missing', elements.ELEMENT_PLUGINS_GROUP))
+    with pytest.raises(RuntimeError, match="plugin 'broken' cannot be loaded"):
+        elements.load_element_plugins()
+    # plugins are not marked as loaded, so an unknown class_name reports the broken plugin too
+    with pytest.raises(RuntimeError, match="plugin 'broken'"):
+        elements.get_element_class('Nope')
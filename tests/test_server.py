@@ -0,0 +1,99 @@
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import BrokenExecutor
+
+import pytest
+
+from async_render import AsyncRenderer
+from benchmark import make_pages
+from data import data_pages
+from document import render_to_bytes
+from pdfcheck import texts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(requests, *options) -> dict:
+    """
+    Sends request lines to a server on stdin and stdout.
+    :return: responses by their ids
+    """
+    # page modes are sent by their names
+    lines = b''.join((request if isinstance(request, bytes) else json.dumps(request, default=lambda mode: mode.name)
+                      .encode()) + b'\n' for request in requests)
+    result = subprocess.run([sys.executable, 'server.py', '-w', '1', *options], cwd=ROOT, input=lines,
+                            capture_output=True, check=True, timeout=120)
+    responses = [json.loads(line) for line in result.stdout.splitlines()]
+    return {response.get('id'): response for response in responses}
+
+
+def test_stdio_protocol():
+    responses = serve([{'id': 1, 'command': 'health'},
+                       b'{"id": 2, "pages":',
+                       {'id': 3, 'pages': data_pages},
+                       {'id': 4, 'command': 'nope'},
+                       {'id': 5, 'pages': [{'page_number': 1}]}])
+    assert responses[1]['ok'] and responses[1]['status'] == 'serving'
+    assert responses[None]['error'].startswith('invalid JSON')
+    assert responses[3]['ok']
+    pdf = base64.b64decode(responses[3]['pdf'])
+    assert responses[3]['size'] == len(pdf)
+    assert texts(pdf) == texts(render_to_bytes(data_pages))
+    assert responses[4]['error'] == "unknown command 'nope'"
+    assert not responses[5]['ok'] and 'PageDataError' in responses[5]['error']
+
+
+def test_stdio_busy_and_shutdown():
+    responses = serve([{'id': 1, 'pages': make_pages(1)},
+                       {'id': 2, 'command': 'shutdown'},
+                       {'id': 3, 'pages': make_pages(1)}], '--max-queue', '0')
+    assert responses[1]['busy']
+    assert responses[2]['ok'] and responses[2]['status'] == 'draining'
+    # requests after the shutdown are rejected or not read at all
+    assert 3 not in responses or responses[3]['error'] == 'the server is shutting down'
+
+
+def test_too_long_line_is_answered(tmp_path, monkeypatch):
+    import server
+    monkeypatch.setattr(server, 'MAX_LINE', 1024)
+    path = str(tmp_path / 'server.sock')
+
+    async def run():
+        render_server = server.RenderServer(workers=1)
+        serving = asyncio.ensure_future(render_server.serve_unix(path))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b'{"id": 1, "pages": "' + b'x' * 10000 + b'"}\n{"id": 2, "command": "health"}\n')
+        responses = [json.loads(await reader.readline()) for _ in range(2)]
+        writer.write(b'{"id": 3, "command": "shutdown"}\n')
+        await reader.readline()
+        writer.close()
+        await serving
+        return responses
+
+    responses = asyncio.run(run())
+    assert responses[0] == server.LINE_TOO_LONG
+    assert responses[1]['id'] == 2 and responses[1]['ok']
+
+
+class _KillWorker():
+    """
+    Pages which kill the worker process when they are unpickled.
+    """
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+def test_renderer_replaces_a_broken_pool():
+    async def run():
+        async with AsyncRenderer(1, use_processes=True) as renderer:
+            with pytest.raises(BrokenExecutor):
+                await renderer.render([_KillWorker()])
+            return await renderer.render(make_pages(1))
+
+    assert len(texts(asyncio.run(run()))) == 1
@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+
+import pytest
+from reportlab.lib.colors import Color, toColor
+
+from data import data_pages
+from document import render_to_bytes
+from fonts import FONTS_DIR
+from pdfcheck import summarize, texts
+from themes import DEFAULT_THEME, ThemeRegistry
+from utils import PageMode
+
+
+def write_themes(directory, config) -> str:
+    path = os.path.join(str(directory), 'themes.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return path
+
+
+def test_themes_extend_other_themes(tmp_path):
+    os.makedirs(tmp_path / 'fonts')
+    shutil.copy(os.path.join(FONTS_DIR, 'NeueMontreal-Bold.ttf'), tmp_path / 'fonts' / 'ThemeTestSans.ttf')
+    path = write_themes(tmp_path, {
+        'fonts': {'ThemeTestSans': 'fonts/ThemeTestSans.ttf'},
+        'themes': [{'name': 'acme', 'fonts': {'regular': 'ThemeTestSans'},
+                    'light': {'background': '#FFF8E7', 'muted': [0, 0, 0, 0.25]}},
+                   {'name': 'acme-dark', 'extends': 'acme', 'dark': {'text': 'rgba(255, 0, 0, 0.5)'}}]})
+    registry = ThemeRegistry(DEFAULT_THEME)
+    acme, acme_dark = registry.load(path)
+    assert registry.names() == ['default', 'acme', 'acme-dark']
+    assert acme.fonts == DEFAULT_THEME.fonts._replace(regular='ThemeTestSans')
+    # relative paths of fonts are relative to the file
+    assert acme.font_files == (('ThemeTestSans', str(tmp_path / 'fonts' / 'ThemeTestSans.ttf')),)
+    assert acme.colors(PageMode.light).background == toColor('#FFF8E7')
+    assert acme.colors(PageMode.light).muted == Color(0, 0, 0, 0.25)
+    assert acme.colors(PageMode.dark) == DEFAULT_THEME.colors(PageMode.dark)
+    # the extending theme keeps fonts and colors of its base
+    assert acme_dark.fonts == acme.fonts and acme_dark.font_files == acme.font_files
+    assert acme_dark.colors(PageMode.light) == acme.colors(PageMode.light)
+    assert acme_dark.colors(PageMode.dark).text.rgba() == pytest.approx((1, 0, 0, 0.5))
+
+    # the font of the theme file is embedded, the lines are broken for its widths
+    data = render_to_bytes(data_pages, theme=acme_dark)
+    assert 'What Is It?' in texts(data)[0]
+    assert 'NeueMontreal-Bold' in summarize(data)['pages'][0]['fonts']
+
+
+@pytest.mark.parametrize('theme, message', [
+    ({'name': 'acme', 'fonts': {'serif': 'Times-Roman'}}, "theme 'acme'.*serif"),
+    ({'name': 'acme', 'light': {'background': 'not a color'}}, "theme 'acme': invalid color 'not a color'"),
+    ({'name': 'acme', 'dark': {'glow': '#FFFFFF'}}, "theme 'acme'.*glow"),
+    ({'name': 'acme', 'extends': 'nope'}, "unknown theme 'nope'"),
+    ({'fonts': {}}, 'a theme name is expected'),
+])
+def test_invalid_themes(tmp_path, theme, message):
+    with pytest.raises(ValueError, match=message):
+        ThemeRegistry(DEFAULT_THEME).load(write_themes(tmp_path, {'themes': [theme]}))
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple, Union
+
+from reportlab.lib import colors
+from reportlab.lib.colors import Color
+
+
+class ThemeFonts(NamedTuple):
+    """
+    Font names of a theme, they should be declared in fonts.fonts or in font_files of the theme or be standard fonts.
+    """
+    regular: str = 'NeueMontreal'
+    medium: str = 'NeueMontrealMedium'
+    # the font of categories and footers
+    mono: str = 'ZagmaMonoTrial'
+
+
+class ModeColors(NamedTuple):
+    """
+    Colors of a theme for one page mode.
+    """
+    background: Color
+    text: Color
+    # breadcrumbs and footer texts
+    muted: Color
+    category_text: Color
+    category_fill: Color
+    # lines between rows of tables
+    rule: Color
+
+
+class Theme(NamedTuple):
+    """
+    A compiled theme: immutable font and color tables read by stylesheets, templates and content elements.
+    A theme is hashable, so stylesheets and drawings are cached per theme and switching themes rebuilds nothing.
+    """
+    name: str
+    fonts: ThemeFonts
+    # (mode name, colors) for each page mode
+    palettes: Tuple[Tuple[str, ModeColors], ...]
+    # (font name, path to the TTF file) of fonts which are not declared in fonts.fonts.
+    # They are declared by the process which uses the theme, e.g. a worker.
+    font_files: Tuple[Tuple[str, str], ...] = ()
+
+    def __hash__(self):
+        # colors are not hashed, themes are compared by all their tables when the hashes are equal
+        return hash((self.name, self.fonts))
+
+    def colors(self, mode) -> ModeColors:
+        """
+        :param mode: a page mode
+        :return: colors of the theme for the mode
+        """
+        for name, palette in self.palettes:
+            if name == mode.name:
+                return palette
+        raise ValueError('theme {!r} has no colors for the {!r} mode'.format(self.name, mode.name))
+
+
+DEFAULT_THEME = Theme('default', ThemeFonts(), (
+    ('light', ModeColors(background=colors.toColor('#FFFFFF'),
+                         text=colors.toColor('#121212'),
+                         muted=Color(red=0, green=0, blue=0, alpha=0.5),
+                         category_text=colors.toColor('#233137'),
+                         category_fill=colors.toColor('#EDEDED'),
+                         rule=Color(1, 1, 1, alpha=0.1))),
+    ('dark', ModeColors(background=colors.toColor('#233137'),
+                        text=colors.toColor('#FFFFFF'),
+                        muted=Color(0.5, 0.5, 0.5),
+                        category_text=colors.toColor('#233137'),
+                        category_fill=colors.toColor('#ADC3CA'),
+                        rule=Color(1, 1, 1, alpha=0.1))),
+))
+
+
+def parse_color(value) -> Color:
+    """
+    :param value: a color name, '#RRGGBB', 'rgba(r, g, b, a)' or a list of 3 or 4 components from 0 to 1
+    :return: the color
+    """
+    if isinstance(value, (list, tuple)) and len(value) in (3, 4):
+        return Color(*value)
+    if isinstance(value, str):
+        try:
+            return colors.toColor(value)
+        except ValueError:
+            pass
+    raise ValueError('invalid color {!r}'.format(value))
+
+
+def compile_theme(config: dict, base: Theme = DEFAULT_THEME, font_files: dict = None) -> Theme:
+    """
+    Compiles a theme from its configuration, missing fonts and colors are taken from the base theme:
+    {"name": "acme", "fonts": {"regular": "AcmeSans"}, "light": {"text": "#000000"}, "dark": {...}}
+    :param config: the theme configuration
+    :param base: the theme which is extended
+    :param font_files: paths to TTF files of fonts used by the theme by their names
+    :return: the theme
+    """
+    name = config.get('name')
+    if not isinstance(name, str) or not name:
+        raise ValueError('a theme name is expected')
+    try:
+        theme_fonts = base.fonts._replace(**config.get('fonts', {}))
+        palettes = []
+        for mode_name, palette in base.palettes:
+            overrides = config.get(mode_name, {})
+            palettes.append((mode_name, palette._replace(**{key: parse_color(value)
+                                                             for key, value in overrides.items()})))
+    except (TypeError, ValueError) as e:
+        raise ValueError('theme {!r}: {}'.format(name, e)) from None
+    files = dict(base.font_files)
+    files.update((font_name, filename) for font_name, filename in (font_files or {}).items()
+                 if font_name in theme_fonts)
+    return Theme(name, theme_fonts, tuple(palettes), tuple(sorted(files.items())))
+
+
+@lru_cache(maxsize=None)
+def theme_digest(theme: Theme) -> str:
+    """
+    :return: a stable key of the theme content for persistent caches
+    """
+    content = json.dumps([theme.name, theme.fonts, [[name, [color.rgba() for color in palette]]
+                                                    for name, palette in theme.palettes], theme.font_files])
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class ThemeRegistry():
+    """
+    This class keeps named themes, e.g. one theme per white-label customer.
+    """
+    def __init__(self, *themes: Theme):
+        self.__themes = {theme.name: theme for theme in themes}
+        self.__lock = threading.Lock()
+
+    def register(self, theme: Theme) -> Theme:
+        """
+        Adds a theme or replaces a theme with the same name.
+        Cached stylesheets and drawings of the replaced theme are not used, because they are keyed by the theme content.
+        """
+        with self.__lock:
+            self.__themes[theme.name] = theme
+        return theme
+
+    def get(self, name) -> Theme:
+        """
+        :param name: name of a registered theme
+        :return: the theme
+        """
+        try:
+            return self.__themes[name]
+        except KeyError:
+            raise ValueError('unknown theme {!r}, expected one of {}'.format(name, ', '.join(self.__themes)))
+
+    def names(self) -> List[str]:
+        return list(self.__themes)
+
+    def load(self, path) -> List[Theme]:
+        """
+        Registers themes from a JSON file:
+        {"fonts": {"AcmeSans": "fonts/AcmeSans.ttf"}, "themes": [{"name": "acme", "extends": "default", ...}]}
+        Relative paths of font files are relative to the file.
+        A theme extends the default theme or another theme registered before it.
+        :param path: path of the file
+        :return: loaded themes
+        """
+        with open(path, 'rb') as f:
+            config = json.load(f)
+        directory = os.path.dirname(os.path.abspath(path))
+        font_files = {font_name: os.path.normpath(os.path.join(directory, filename))
+                      for font_name, filename in config.get('fonts', {}).items()}
+        loaded = []
+        for theme_config in config.get('themes', []):
+            base = self.get(theme_config.get('extends', DEFAULT_THEME.name))
+            loaded.append(self.register(compile_theme(theme_config, base, font_files)))
+        return loaded
+
+
+# Themes from the file in PDFGEN_THEMES environment variable are loaded in every process, e.g. in workers
+themes = ThemeRegistry(DEFAULT_THEME)
+if os.environ.get('PDFGEN_THEMES'):
+    themes.load(os.environ['PDFGEN_THEMES'])
+
+_current_theme: ContextVar[Theme] = ContextVar('theme', default=DEFAULT_THEME)
+
+
+def get_theme(theme: Union[str, Theme]) -> Theme:
+    """
+    :param theme: a name of a registered theme or a theme
+    :return: the theme
+    """
+    if isinstance(theme, Theme):
+        return theme
+    return themes.get(theme)
+
+
+def current_theme() -> Theme:
+    """
+    :return: the theme of the document being built in the current thread
+    """
+    return _current_theme.get()
+
+
+@contextmanager
+def use_theme(theme: Theme):
+    """
+    Makes the theme current for content elements created during the block.
+    """
+    token = _current_theme.set(theme)
+    try:
+        yield theme
+    finally:
+        _current_theme.reset(token)
@@ -1,11 +1,15 @@
 from enum import Enum
 
-from reportlab.lib import colors
 from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_RIGHT
 from reportlab.lib.styles import StyleSheet1, ParagraphStyle
 
+from fonts import fonts
+from instrumentation import current_stats, span_of
+from themes import Theme, DEFAULT_THEME
+
 
 class PageMode(Enum):
+    # the background colors of the default theme, other themes define own colors for each mode (see themes.py)
     light = '#FFFFFF'
     dark = '#233137'
 
@@ -14,34 +18,40 @@ def get_page_number_as_str(number):
     if number < 10:
         return '0' + str(number)
     else:
-        str(number)
-
-def split_text(str):
-    middle = round(len(str) / 2)
-    if (middle != '.'):
-        middle = str.find('.', middle)
+        return str(number)
 
-    first_text = str[:middle+1]
-    second_text = str[middle+1:]
-    return (first_text, second_text)
+def normalize_data(value):
+    """
+    :return: page data converted to JSON types, enums are replaced by their names and tuples by lists
+    """
+    if isinstance(value, Enum):
+        return value.name
+    if hasattr(value, 'to_dict'):
+        return normalize_data(value.to_dict())
+    if isinstance(value, dict):
+        return {str(key): normalize_data(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_data(item) for item in value]
+    return value
 
 
-def getStyleSheet(mode: PageMode = PageMode.light):
+def getStyleSheet(mode: PageMode = PageMode.light, theme: Theme = DEFAULT_THEME):
     stylesheet = StyleSheet1()
 
-    main_text_color = '#121212' if mode == PageMode.light else '#FFFFFF'
-    transparent_color = colors.Color(red=0, green=0, blue=0, alpha=0.5) if mode == PageMode.light else colors.Color(0.5,
-                                                                                                                    0.5,
-                                                                                                                    0.5)
+    # fonts and colors of the theme for the mode
+    theme_fonts = theme.fonts
+    palette = theme.colors(mode)
+    main_text_color = palette.text
+    transparent_color = palette.muted
     stylesheet.add(ParagraphStyle(name='Normal',
-                                  fontName=('NeueMontreal'),
+                                  fontName=theme_fonts.regular,
                                   fontSize=10,
                                   leading=12,
                                   textColor=main_text_color)
                    )
     stylesheet.add(ParagraphStyle(name='Subtitle',
                                   parent=stylesheet['Normal'],
-                                  fontName='NeueMontrealMedium')
+                                  fontName=theme_fonts.medium)
                    )
     stylesheet.add(ParagraphStyle(name='BodyText',
                                   parent=stylesheet['Normal'],
@@ -54,11 +64,11 @@ def getStyleSheet(mode: PageMode = PageMode.light):
                    )
     stylesheet.add(ParagraphStyle(name='SmallTitle',
                                   parent=stylesheet['SmallText'],
-                                  fontName='NeueMontrealMedium')
+                                  fontName=theme_fonts.medium)
                    )
     stylesheet.add(ParagraphStyle(name='Heading1',
                                   parent=stylesheet['Normal'],
-                                  fontName='NeueMontrealMedium',
+                                  fontName=theme_fonts.medium,
                                   fontSize=40,
                                   leading=40,
                                   spaceAfter=6,
@@ -77,26 +87,61 @@ def getStyleSheet(mode: PageMode = PageMode.light):
                    )
     stylesheet.add(ParagraphStyle(name='PageNumber',
                                   parent=stylesheet['Normal'],
-                                  fontName='NeueMontreal',
+                                  fontName=theme_fonts.regular,
                                   leading=12,
                                   alignment=TA_RIGHT,
                                   fontSize=15)
                    )
     stylesheet.add(ParagraphStyle(name='Category',
                                   parent=stylesheet['Normal'],
-                                  fontName='ZagmaMonoTrial',
+                                  fontName=theme_fonts.mono,
                                   leading=12,
                                   alignment=TA_RIGHT,
-                                  textColor = '#233137',
+                                  textColor=palette.category_text,
                                   fontSize=8)
                    )
 
     stylesheet.add(ParagraphStyle(name='FooterText',
                                   parent=stylesheet['Normal'],
-                                  fontName='ZagmaMonoTrial',
+                                  fontName=theme_fonts.mono,
                                   leading=12,
                                   alignment=TA_LEFT,
                                   fontSize=8,
                                   textColor=transparent_color)
                    )
+    # fonts are registered lazily, only fonts used by the styles are loaded
+    for font_name, filename in theme.font_files:
+        fonts.declare(font_name, filename)
+    fonts.ensure(*{style.fontName for style in stylesheet.byName.values()})
     return stylesheet
+
+
+class StyleSheetRegistry():
+    """
+    This class keeps stylesheets shared by all content elements.
+    A stylesheet is built once per process for each page mode and theme and reused everywhere.
+    """
+    def __init__(self):
+        self.__stylesheets = {}
+
+    def get(self, mode: PageMode = PageMode.light, theme: Theme = DEFAULT_THEME) -> StyleSheet1:
+        """
+        :param mode: page mode
+        :param theme: theme of the document
+        :return: a shared stylesheet for the page mode and the theme. It must not be modified by the caller.
+        """
+        key = (mode, theme)
+        stylesheet = self.__stylesheets.get(key)
+        if stylesheet is None:
+            with span_of(current_stats(), 'styles.build'):
+                stylesheet = self.__stylesheets[key] = getStyleSheet(mode, theme)
+        return stylesheet
+
+    def invalidate(self):
+        """
+        Drops all built stylesheets, they will be built again on the next request (e.g. in tests).
+        """
+        self.__stylesheets.clear()
+
+
+stylesheets = StyleSheetRegistry()